@@ -0,0 +1,72 @@
+import time
+
+"""Maximum cliques of the primal graph by branch and bound over bitsets, used by the clique modes and lower bounds"""
+
+
+def _color(candidates, adj):
+    """Greedy sequential coloring of the candidates, returns the vertices with their color in ascending order of
+    colors. A vertex with color k cannot extend a clique by more than k vertices."""
+    result = []
+    uncolored = candidates
+    k = 0
+    while uncolored:
+        k += 1
+        q = uncolored
+        while q:
+            low = q & -q
+            v = low.bit_length() - 1
+            result.append((v, k))
+            uncolored ^= low
+            q &= ~adj[v] & ~low
+
+    return result
+
+
+def max_clique(g, timeout=None):
+    """Returns a maximum clique of the primal graph of g, starting from the largest hyperedge as every hyperedge is a
+    clique. After timeout seconds, the largest clique found so far is returned."""
+    neighbors = {v: set() for v in g.nodes()}
+    for e in g.edges().values():
+        for v in e:
+            neighbors[v].update(e)
+    for v, nb in neighbors.items():
+        nb.discard(v)
+
+    # Vertices are renumbered by descending degree, bit i represents the i-th vertex
+    order = sorted(neighbors, key=lambda x: (-len(neighbors[x]), x))
+    index = {v: i for i, v in enumerate(order)}
+    adj = []
+    for v in order:
+        bits = 0
+        for u in neighbors[v]:
+            bits |= 1 << index[u]
+        adj.append(bits)
+
+    best = [index[v] for v in set(max(g.edges().values(), key=len, default=()))]
+    deadline = None if timeout is None else time.time() + timeout
+
+    # Each level holds the clique, its remaining candidates and the colored candidates that are not yet expanded
+    candidates = (1 << len(order)) - 1
+    stack = [([], [candidates], _color(candidates, adj))]
+    steps = 0
+    while stack:
+        steps += 1
+        if deadline is not None and steps % 256 == 0 and time.time() > deadline:
+            break
+
+        clique, c_candidates, colored = stack[-1]
+        # Vertices are expanded in descending order of colors, the remaining ones cannot improve the best clique
+        if not colored or len(clique) + colored[-1][1] <= len(best):
+            stack.pop()
+            continue
+
+        v, _ = colored.pop()
+        c_candidates[0] &= ~(1 << v)
+        new_clique = clique + [v]
+        new_candidates = c_candidates[0] & adj[v]
+        if new_candidates:
+            stack.append((new_clique, [new_candidates], _color(new_candidates, adj)))
+        elif len(new_clique) > len(best):
+            best = new_clique
+
+    return [order[i] for i in best]
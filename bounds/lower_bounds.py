@@ -1,73 +1,81 @@
 from sys import maxsize
-from itertools import chain, combinations
+
+from bounds.clique import max_clique
+from bounds.set_cover import cover_index, popcount
+
+
+def _independent_set(candidates, adj_bits):
+    """Greedily packs the candidate with the fewest adjacent candidates, returns the size of the independent set"""
+    size = 0
+    while candidates:
+        c_min = (maxsize, None)
+        r = candidates
+        while r:
+            low = r & -r
+            r ^= low
+            x = low.bit_length() - 1
+            c_min = min(c_min, (popcount(adj_bits[x] & candidates), x))
+
+        x = c_min[1]
+        candidates &= ~(adj_bits[x] | (1 << x))
+        size += 1
+
+    return size
 
 
 def mmd(g_in, ub=maxsize):
     # Copy hypergraph
     edges = {k: set(v) for k, v in g_in.edges().items()}
-    adj = {x: {k for k, e in edges.items() if x in e} for x in g_in.nodes()}
+    adj = {x: set() for x in g_in.nodes()}
+    for k, e in edges.items():
+        for x in e:
+            adj[x].add(k)
     nodes = list(g_in.nodes())
     bound = 1
 
-    pairwise = {n1: {n2: any(n1 in v and n2 in v for v in edges.values()) for n2 in nodes} for n1 in nodes}
+    # Adjacency as bitsets, bit v represents vertex v
+    pairwise = {x: 0 for x in nodes}
+    for e in edges.values():
+        e_bits = 0
+        for x in e:
+            e_bits |= 1 << x
+        for x in e:
+            pairwise[x] |= e_bits & ~(1 << x)
+
+    # The degree is not a bound as in tw. The corresponding bound for ghtw (and therefore tw, as ghtw <= htw) is
+    # the vertex with the smallest edge cover for itself and its adjacent vertices. As the optimal edge cover can
+    # be time consuming to calculate, we use a lower bound for it: pairwise non-adjacent neighbors require distinct
+    # edges. The estimates only change for the vertices adjacent to a contraction.
+    estimates = {n: max(1, _independent_set(pairwise[n], pairwise)) for n in nodes}
 
     while len(nodes) > bound:
-        # The degree is not a bound as in tw. The corresponding bound for ghtw (and therefore tw, as ghtw <= htw) is
-        # the vertex with the smallest edge cover for itself and its adjacent vertices. As the optimal edge cover can
-        # be time consuming to calculate, we use a lower bound for it.
-
-        # Min and Second min
-        cover = (maxsize, maxsize)
-        min_nodes = (None, None)
-        # TODO: The values should be cachable...
-        for n in nodes:
-            # Find all adjacent vertices
-            nb = set(chain.from_iterable(edges[x] for x in adj[n]))
-
-            # Now gather those adjacent vertices that occur in only one edge
-            # occurrence = {x for x in nb if 1 == len([k for k, v in edges.items() if x in v])}
-            #
-            # # Count edges containing one of the unique vertices
-            # estimate = len([k for k, v in edges.items() if len((v & occurrence)) > 0])
-
-            nb.remove(n)
-
-            estimate = 1
-            start = 2
-
-            found = True
-            while found and start < cover[1]:
-                found = False
-                for comb in combinations(nb, start):
-                    if all(not pairwise[x][y] for x in comb for y in comb if x > y):
-                        estimate = start
-                        start += 1
-                        found = True
-                        break
-
-            if estimate < cover[0]:
-                cover = (estimate, cover[0])
-                min_nodes = (n, min_nodes[0])
-            elif estimate < cover[1]:
-                cover = (cover[0], estimate)
-                min_nodes = (min_nodes[0], n)
-
-        bound = max(bound, cover[0])
+        # The first vertex with the minimum estimate
+        n = min(nodes, key=estimates.get)
+        bound = max(bound, estimates[n])
 
         # Find min common edges neighbor
-        n = min_nodes[0]
         n_edges = set(adj[n])
-        n_nb = set(chain.from_iterable(edges[x] for x in adj[n]))
 
         c_min = (maxsize, None)
-        for u in n_nb:
-            if u != n:
-                val = len(n_edges & set(adj[u]))
-                c_min = min(c_min, (val, u))
+        r = pairwise[n]
+        while r:
+            low = r & -r
+            r ^= low
+            u = low.bit_length() - 1
+            val = len(n_edges & adj[u])
+            c_min = min(c_min, (val, u))
 
-        # Contract
+        nodes.remove(n)
+        estimates.pop(n)
+        adj.pop(n)
+
+        # Isolated vertices are removed without contraction
         u = c_min[1]
-        for x in adj[n]:
+        if u is None:
+            continue
+
+        # Contract
+        for x in n_edges:
             e = edges[x]
             e.remove(n)
             e.add(u)
@@ -77,10 +85,16 @@ def mmd(g_in, ub=maxsize):
             else:
                 adj[u].discard(x)
 
-        for x, tv in pairwise[n].items():
-            if tv:
-                pairwise[u][x] = True
-                pairwise[x][u] = True
+        n_bits = pairwise.pop(n)
+        r = n_bits
+        while r:
+            low = r & -r
+            r ^= low
+            x = low.bit_length() - 1
+            pairwise[x] &= ~(1 << n)
+            if x != u:
+                pairwise[x] |= 1 << u
+        pairwise[u] |= n_bits & ~(1 << u)
 
         # Cleanup redundant edges, either single vertex, or subsumed edges
         removal = set()
@@ -100,9 +114,31 @@ def mmd(g_in, ub=maxsize):
 
         for ek in removal:
             for x in edges[ek]:
-                adj[x].remove(ek)
+                adj[x].discard(ek)
 
-        adj.pop(n)
-        nodes.remove(n)
+        # Only the neighborhoods of u and its neighbors changed
+        r = pairwise[u] | (1 << u)
+        while r:
+            low = r & -r
+            r ^= low
+            x = low.bit_length() - 1
+            estimates[x] = max(1, _independent_set(pairwise[x], pairwise))
 
     return bound
+
+
+def clique_bound(g, clique, weights=None, limit=1000):
+    """Every clique of the primal graph is contained in a bag, hence the optimal cover of a clique is a lower bound.
+    After limit search nodes, the bound of the search is used instead of the optimum."""
+    if not clique:
+        return 1
+    return cover_index(g, weights).cover_lower_bound(clique, limit)
+
+
+def lower_bound(g, clique=None, weights=None, limit=1000):
+    """Combines mmd with the cover of a clique, a large clique is computed if none is given. Weights have to be at
+    least 1, as mmd counts edges."""
+    if clique is None:
+        clique = max_clique(g, timeout=1)
+
+    return max(mmd(g), clique_bound(g, clique, weights, limit))
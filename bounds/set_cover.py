@@ -0,0 +1,274 @@
+from collections import OrderedDict, namedtuple
+from heapq import heapify, heappop, heappush
+from math import ceil
+from sys import maxsize
+
+"""Greedy set cover of bags by hyperedges, shared by the upper bound heuristics"""
+
+# int.bit_count requires Python 3.10
+popcount = getattr(int, "bit_count", lambda x: bin(x).count("1"))
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+
+def cover_index(g, weights=None):
+    """Returns the index of the hypergraph for the given weights. The index is attached to the hypergraph, such that
+    all heuristics share the cached covers"""
+    indices = getattr(g, "_cover_indices", None)
+    if indices is None:
+        indices = g._cover_indices = {}
+
+    index = indices.get(weights is not None)
+    # Rebuild the index if the weights or edges changed, edges are tuples and cannot be modified in place
+    if index is None or index.weights != weights or index.edges != g.edges():
+        index = indices[weights is not None] = CoverIndex(g, weights)
+    return index
+
+
+class CoverIndex:
+    """Indexes the hyperedges of a hypergraph, such that a bag is only compared to the edges incident to its vertices.
+    Edges are represented as bitsets, bit v represents vertex v. Computed covers are kept in a bounded LRU cache."""
+
+    def __init__(self, g, weights=None, cache_size=4096):
+        # Copies of the edges and weights the index has been built for
+        self.edges = dict(g.edges())
+        self.weights = None if weights is None else dict(weights)
+        self.cache_size = cache_size
+        # (kind, bag) -> cover, the least recently used entry comes first
+        self._cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.bits = {}
+        # The position of an edge breaks ties, as the previous scans over all edges kept the first best edge
+        self.position = {}
+        self.incident = {}
+
+        for i, (e, ed) in enumerate(g.edges().items()):
+            self.position[e] = i
+            self.bits[e] = 0
+            for v in ed:
+                self.bits[e] |= 1 << v
+                self.incident.setdefault(v, []).append(e)
+
+    def cache_info(self):
+        return CacheInfo(self.hits, self.misses, self.cache_size, len(self._cache))
+
+    def _lookup(self, key):
+        result = self._cache.get(key)
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._cache.move_to_end(key)
+        return result
+
+    def _store(self, key, result):
+        self._cache[key] = result
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def cover(self, bag):
+        """Greedily covers the bag. Without weights, the edge covering the most remaining vertices is chosen, otherwise
+        the edge with the lowest cost per covered vertex. Returns the chosen edges with their weights."""
+        remaining = 0
+        for v in bag:
+            remaining |= 1 << v
+
+        result = self._lookup(("greedy", remaining))
+        if result is None:
+            result = self._greedy(bag, remaining)
+            self._store(("greedy", remaining), result)
+        # Callers may modify the cover
+        return dict(result)
+
+    def candidates(self, bag, target, dominated=None):
+        """Returns the edges incident to the bag that are not dominated, as tuples of edge, intersection with the bag
+        and weight. An edge is dominated if another edge has a superset of its intersection at no higher weight. If
+        given, dominated maps every kept edge to the position, edge, intersection and weight of the edges it
+        dominates."""
+        edges = set()
+        for v in bag:
+            edges.update(self.incident.get(v, ()))
+        options = [(e, self.bits[e] & target, self.weights[e] if self.weights else 1) for e in edges]
+        # Dominating edges come first, of equal edges the first in the hypergraph is kept
+        options.sort(key=lambda o: (-popcount(o[1]), o[2], self.position[o[0]]))
+
+        result = []
+        # Vertex -> kept edges containing it, a dominating edge contains every vertex of the intersection
+        kept = {}
+        for e, eb, w in options:
+            low = (eb & -eb).bit_length() - 1
+            dominators = [e2 for e2, eb2, w2 in kept.get(low, ()) if w2 <= w and eb & ~eb2 == 0]
+            if dominators:
+                if dominated is not None:
+                    for e2 in dominators:
+                        dominated.setdefault(e2, []).append((self.position[e], e, eb, w))
+                continue
+            result.append((e, eb, w))
+            r = eb
+            while r:
+                low = r & -r
+                r ^= low
+                kept.setdefault(low.bit_length() - 1, []).append((e, eb, w))
+
+        return result
+
+    def _greedy(self, bag, remaining):
+        # Lazy greedy, the keys are bounds that are only updated once an edge reaches the top
+        dominated = {}
+        queue = [(self._key(e, remaining), self._tie(e, remaining, dominated)[0], e)
+                 for e, _, _ in self.candidates(bag, remaining, dominated)]
+        heapify(queue)
+
+        result = {}
+        while remaining:
+            if not queue:
+                raise ValueError("The bag contains vertices that are not covered by any edge")
+
+            key, pos, e = heappop(queue)
+            c_key = self._key(e, remaining)
+            if c_key is None:
+                continue
+            c_pos, chosen = self._tie(e, remaining, dominated)
+            if (c_key, c_pos) != (key, pos):
+                heappush(queue, (c_key, c_pos, e))
+                continue
+
+            # The chosen edge covers the same remaining vertices as e
+            remaining &= ~self.bits[chosen]
+            result[chosen] = self.weights[chosen] if self.weights else 1
+
+        return result
+
+    def exact_cover(self, bag, ub=maxsize, limit=None):
+        """Computes a cover of minimum cost by branch and bound. Branches on the remaining vertex with the fewest
+        incident edges and memoizes the cheapest cost with which each set of remaining vertices has been reached.
+        Returns None if there is no cover cheaper than ub. After limit search nodes, the best cover found is returned."""
+        target = 0
+        for v in bag:
+            target |= 1 << v
+
+        # Completed searches are cached with their bound. Without a cover, no cover is cheaper than the bound
+        cached = self._lookup(("exact", target))
+        if cached is not None:
+            c_result, c_ub = cached
+            if c_result is not None:
+                return dict(c_result) if sum(c_result.values()) < ub else None
+            if ub <= c_ub:
+                return None
+
+        result, complete, _ = self._exact(bag, target, ub, limit)
+        # A search that has been cut off may have missed cheaper covers
+        if complete:
+            self._store(("exact", target), (result, ub))
+        return None if result is None else dict(result)
+
+    def cover_lower_bound(self, bag, limit=None):
+        """Returns a lower bound on the cost of covering the bag. This is the minimum cost if the search completes
+        within limit search nodes, otherwise the bound of the search for the whole bag."""
+        target = 0
+        for v in bag:
+            target |= 1 << v
+
+        cached = self._lookup(("exact", target))
+        if cached is not None and cached[0] is not None:
+            return sum(cached[0].values())
+
+        result, complete, root_lb = self._exact(bag, target, maxsize, limit)
+        if not complete:
+            return root_lb
+        self._store(("exact", target), (result, maxsize))
+        return sum(result.values())
+
+    def _exact(self, bag, target, ub, limit):
+        """Returns the best cover found, whether the search has been completed and the lower bound for the bag"""
+        by_vertex = {v: [] for v in bag}
+        for e, eb, w in self.candidates(bag, target):
+            r = eb
+            while r:
+                low = r & -r
+                r ^= low
+                by_vertex[low.bit_length() - 1].append((e, eb, w))
+        if not all(by_vertex.values()):
+            raise ValueError("The bag contains vertices that are not covered by any edge")
+        neighborhood = {v: 0 for v in bag}
+        for v in bag:
+            for _, eb, _ in by_vertex[v]:
+                neighborhood[v] |= eb
+        # Least covered vertices first, these have the fewest branches
+        branch_order = sorted(bag, key=lambda x: len(by_vertex[x]))
+
+        best = None
+        best_cost = ub
+        root_lb = self._bound(target, branch_order, by_vertex, neighborhood)
+        # Remaining vertices -> cheapest cost with which they have been reached
+        memo = {}
+        # Entries are the remaining vertices, the cost so far and the chosen edges as a linked list
+        stack = [(target, 0, None)]
+        while stack:
+            remaining, cost, chosen = stack.pop()
+            if not remaining:
+                if cost < best_cost:
+                    best, best_cost = chosen, cost
+                continue
+            if memo.get(remaining, maxsize) <= cost:
+                continue
+            memo[remaining] = cost
+            if limit is not None and len(memo) > limit:
+                return self._unwind(best), False, root_lb
+
+            if cost + self._bound(remaining, branch_order, by_vertex, neighborhood) >= best_cost:
+                continue
+
+            v = next(x for x in branch_order if remaining >> x & 1)
+            options = sorted(by_vertex[v], key=lambda o: (o[2] / popcount(o[1] & remaining), self.position[o[0]]))
+            # Reversed, such that the most promising edge is expanded first
+            for e, eb, w in reversed(options):
+                if cost + w < best_cost:
+                    stack.append((remaining & ~eb, cost + w, (e, chosen)))
+
+        return self._unwind(best), True, root_lb
+
+    def _bound(self, remaining, branch_order, by_vertex, neighborhood):
+        """Lower bound on the cost of covering the remaining vertices"""
+        # Every remaining vertex pays at least the cheapest cost per vertex of its edges. Vertices that share no edge
+        # require distinct edges, the max of both bounds is used. Costs are integral
+        lb = 0
+        lb_packing = 0
+        blocked = 0
+        for x in branch_order:
+            if remaining >> x & 1:
+                lb += min(w / popcount(eb & remaining) for _, eb, w in by_vertex[x])
+                if not blocked >> x & 1:
+                    lb_packing += min(w for _, _, w in by_vertex[x])
+                    blocked |= neighborhood[x]
+        return max(ceil(lb - 1e-9), lb_packing)
+
+    def _unwind(self, chosen):
+        """Converts the linked list of chosen edges to a cover"""
+        if chosen is None:
+            return None
+
+        result = {}
+        while chosen is not None:
+            e, chosen = chosen
+            result[e] = self.weights[e] if self.weights else 1
+        return result
+
+    def _tie(self, e, remaining, dominated):
+        """Returns the position for breaking ties and the edge at that position. A dominated edge covering the same
+        remaining vertices at the same weight is interchangeable with e, hence the first of them is used. This
+        reproduces the choice of the greedy cover over all edges."""
+        eb = remaining & self.bits[e]
+        w = self.weights[e] if self.weights else 1
+        ties = [(pos, d) for pos, d, db, dw in dominated.get(e, ()) if dw == w and remaining & db == eb]
+        return min(ties + [(self.position[e], e)])
+
+    def _key(self, e, remaining):
+        """Priority of the edge, smaller is better. None if the edge does not cover any remaining vertex"""
+        intersect = popcount(remaining & self.bits[e])
+        if intersect == 0:
+            return None
+        if self.weights:
+            return self.weights[e] * 1.0 / intersect
+        return -intersect
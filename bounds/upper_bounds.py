@@ -1,58 +1,212 @@
-from networkx import Graph, DiGraph, descendants, shortest_path
-from itertools import combinations
+from networkx import Graph, DiGraph, descendants
+from itertools import combinations, repeat
+from concurrent.futures import ProcessPoolExecutor
 from sys import maxsize
-from random import randint
+from math import isqrt, exp
+import random
+from random import randint, Random
+import time
+from heapq import heapify, heappush, heappop
+
+from bounds.set_cover import cover_index, popcount
+
+
+def _bits(x):
+    """Iterates over the vertices in the bitset x"""
+    while x:
+        low = x & -x
+        x ^= low
+        yield low.bit_length() - 1
+
+
+def _missing(adj, nb):
+    """Number of non-adjacent pairs in nb, adjacency is given as bitsets"""
+    return sum(popcount(nb & ~adj[u] & ~(1 << u)) for u in _bits(nb)) // 2
+
+
+def _mcs_ordering(adj, priority):
+    """Maximum cardinality search, the elimination ordering is the reversed visiting order"""
+    # Vertices with the most visited neighbors are visited first, hence the negated counts
+    current = {v: (0, priority[v], v) for v in adj}
+    queue = list(current.values())
+    heapify(queue)
+
+    visited = []
+    while queue:
+        entry = heappop(queue)
+        n = entry[-1]
+        if current.get(n) != entry:
+            continue
+
+        visited.append(n)
+        current.pop(n)
+        for u in _bits(adj[n]):
+            if u in current:
+                cnt, prio, _ = current[u]
+                current[u] = (cnt - 1, prio, u)
+                heappush(queue, current[u])
+
+    visited.reverse()
+    return visited
+
+
+def compute_ordering(pg, criterion="degree", seed=None):
+    """Computes an elimination ordering using the min-degree, min-fill or maximum cardinality search heuristic. Ties
+    are broken by the degree and then by the smallest vertex, or randomly if a seed is given."""
+    if criterion not in ("degree", "fill", "mcs"):
+        raise ValueError(f"Unknown ordering criterion {criterion}")
+
+    # Adjacency bitsets, bit u represents vertex u
+    adj = {v: 0 for v in pg.nodes}
+    for u, v in pg.edges:
+        if u != v:
+            adj[u] |= 1 << v
+            adj[v] |= 1 << u
+
+    # Random tie breaking, the priority is fixed per vertex to keep the ordering reproducible
+    rnd = Random(seed)
+    priority = {v: 0 if seed is None else rnd.random() for v in sorted(adj.keys())}
+    if criterion == "mcs":
+        return _mcs_ordering(adj, priority)
+
+    def score(v):
+        deg = popcount(adj[v])
+        return (_missing(adj, adj[v]), deg, priority[v], v) if criterion == "fill" else (deg, priority[v], v)
 
+    # Priority queue with lazy deletion, outdated entries are skipped
+    current = {v: score(v) for v in adj}
+    queue = list(current.values())
+    heapify(queue)
 
-def compute_ordering(pg):
-    # Build elimination ordering
     ordering = []
-    g = pg.copy()
+    while queue:
+        entry = heappop(queue)
+        n = entry[-1]
+        if current.get(n) != entry:
+            continue
 
-    while len(ordering) < len(pg.nodes):
-        # Min Degree with random tiebreaker, tiebreak leads no irreproducibility
-        # _, _, n = min((len(pv[x]), randint(0, 100), x) for x in pv.nodes)
-        _, n = min((len(g[x]), x) for x in g.nodes)
         ordering.append(n)
-        nb = g[n]
-        for u in nb:
-            for v in nb:
-                if u > v:
-                    g.add_edge(u, v)
-
-        g.remove_node(n)
+        current.pop(n)
+        nb = adj.pop(n)
+
+        # Make the neighborhood a clique
+        old = {}
+        for u in _bits(nb):
+            old[u] = adj[u]
+            adj[u] = (adj[u] | nb) & ~(1 << u) & ~(1 << n)
+
+        for u in old:
+            current[u] = score(u)
+            heappush(queue, current[u])
+
+        if criterion == "fill":
+            # Vertices outside the neighborhood keep their degree, they only lose the fill edges added among their
+            # neighbors
+            outer = 0
+            for u in old.values():
+                outer |= u
+            for w in _bits(outer & ~nb & ~(1 << n)):
+                added = _missing(old, adj[w] & nb)
+                if added > 0:
+                    fill, deg, prio, _ = current[w]
+                    current[w] = (fill - added, deg, prio, w)
+                    heappush(queue, current[w])
 
     return ordering
 
 
-def greedy(g, htd, bb=True):
+def greedy(g, htd, bb=True, criterion="degree"):
     # Build primal graph
     pg = Graph()
     for e in g.edges():
         for u, v in combinations(g.get_edge(e), 2):
             pg.add_edge(u, v)
 
-    ordering = compute_ordering(pg)
-    bags, tree, root = ordering_to_decomp(pg, ordering)
+    ordering = compute_ordering(pg, criterion=criterion)
+    bags, tree, _ = ordering_to_decomp(pg, ordering)
     improve_scramble(pg, ordering, bound=max(len(b)-2 for b in bags.values()))
 
     # In case of HTD we require to not violate the special condition
     simplify_decomp(bags, tree)
-    if htd:
-        edge_cover = cover_htd(g, bags, tree, root)
-    else:
-        edge_cover = cover_ghtd(g, bags)
-        if bb:
-            bandb(g, bags, edge_cover)
+    edge_cover = _cover(g, bags, tree, htd)
+    if not htd and bb:
+        bandb(g, bags, edge_cover)
 
     return max(sum(v.values()) for v in edge_cover.values())
 
 
+class _OrderingEvaluator:
+    """Computes the width of an elimination ordering after changing the order within a window. The elimination graph
+    after a set of vertices has been eliminated does not depend on their order, hence only the bags of the window
+    change. Elimination graphs are stored at checkpoints, so that only the vertices between the last checkpoint and
+    the end of the window are eliminated."""
+
+    def __init__(self, pg, ordering, interval):
+        adj = {v: 0 for v in pg.nodes}
+        for u, v in pg.edges:
+            if u != v:
+                adj[u] |= 1 << v
+                adj[v] |= 1 << u
+
+        self.step = max(interval, isqrt(len(adj)))
+        # Position -> elimination graph of the remaining vertices
+        self.checkpoints = {}
+        # Size of the bag of each position, excluding the eliminated vertex itself
+        self.sizes = []
+        self._eliminate(ordering, adj, 0, len(ordering), maxsize, self.sizes, len(ordering))
+        self.window = None
+
+    def _eliminate(self, ordering, adj, start, end, bound, sizes, checkpoint_limit):
+        """Eliminates the vertices from start to end, stores checkpoints for positions up to checkpoint_limit"""
+        for i in range(start, end):
+            if i % self.step == 0 and i <= checkpoint_limit and i not in self.checkpoints:
+                self.checkpoints[i] = dict(adj)
+
+            v = ordering[i]
+            nb = adj.pop(v)
+            sizes.append(popcount(nb))
+            # Stop as soon as a bag is too large
+            if sizes[-1] > bound:
+                return False
+
+            for u in _bits(nb):
+                adj[u] = (adj[u] | nb) & ~(1 << u) & ~(1 << v)
+
+        return True
+
+    def evaluate(self, ordering, start, end, bound):
+        """Returns the width of ordering, or None if it exceeds bound. The ordering must only differ from the last
+        accepted ordering between start and end."""
+        width = max(max(self.sizes[:start], default=0), max(self.sizes[end:], default=0))
+        if width > bound:
+            return None
+
+        position = max(x for x in self.checkpoints.keys() if x <= start)
+        adj = dict(self.checkpoints[position])
+        # The bags before the window are unchanged
+        self._eliminate(ordering, adj, position, start, maxsize, [], start)
+
+        self.window = []
+        # Positions within the window only become valid checkpoints once the ordering is accepted
+        if not self._eliminate(ordering, adj, start, end, bound, self.window, start):
+            return None
+
+        return max(width, max(self.window, default=0))
+
+    def accept(self, start, end):
+        """Updates the bag sizes after the ordering evaluated last has been accepted"""
+        self.sizes[start:end] = self.window
+        # The elimination graph changes only within the window
+        for position in [x for x in self.checkpoints.keys() if start < x < end]:
+            self.checkpoints.pop(position)
+
+
 def improve_scramble(g, ordering, rounds=100, bound=maxsize, interval=15):
     """Tries to improve the bound by randomly scrambling the elements in an interval"""
 
     limit = len(ordering) - 1 - interval if len(ordering) > interval else 0
     interval = min(interval, len(ordering))
+    evaluator = _OrderingEvaluator(g, ordering, interval)
 
     for _ in range(0, rounds):
         index = randint(0, limit) if limit > 0 else 0
@@ -62,18 +216,137 @@ def improve_scramble(g, ordering, rounds=100, bound=maxsize, interval=15):
             randindex = randint(0, interval - 1 - c_i) + index + c_i
             ordering[index + c_i], ordering[randindex] = ordering[randindex], ordering[index + c_i]
 
-        result = max(len(x) for x in ordering_to_decomp(g, ordering)[0].values()) - 1
+        result = evaluator.evaluate(ordering, index, index + interval, bound)
 
         # If the new bound is worse, restore
-        if result > bound:
+        if result is None:
             for i in range(0, interval):
                 ordering[index + i] = old[i]
         else:
             bound = result
+            evaluator.accept(index, index + interval)
 
     return bound
 
 
+def _cover(g, bags, tree, htd):
+    """Computes a greedy cover for the simplified decomposition"""
+    if not htd:
+        return cover_ghtd(g, bags)
+
+    # The simplification may have removed the last vertex of the ordering, and disconnected instances are forests
+    edge_cover = {}
+    for root in [n for n in tree.nodes if tree.in_degree(n) == 0]:
+        c_cover = cover_htd(g, bags, tree, root)
+        for n in descendants(tree, root) | {root}:
+            edge_cover[n] = c_cover[n]
+
+    return edge_cover
+
+
+def _run_variant(g, htd, criterion, seed, random_ties):
+    """Computes an upper bound from a single ordering heuristic, returns the width, ordering, bags and cover"""
+    pg = Graph()
+    for e in g.edges():
+        for u, v in combinations(g.get_edge(e), 2):
+            pg.add_edge(u, v)
+
+    ordering = compute_ordering(pg, criterion=criterion, seed=seed if random_ties else None)
+    bags, _, _ = ordering_to_decomp(pg, ordering)
+    # improve_scramble uses the global random number generator, this process is the only one using it
+    random.seed(seed)
+    improve_scramble(pg, ordering, bound=max(len(b)-2 for b in bags.values()))
+
+    bags, tree, _ = ordering_to_decomp(pg, ordering)
+    simplify_decomp(bags, tree)
+    # cover_htd adds the vertices pulled in by the cover to the bags
+    edge_cover = _cover(g, bags, tree, htd)
+
+    return max(sum(v.values()) for v in edge_cover.values()), ordering, bags, edge_cover
+
+
+def multi_start(g, htd, starts=8, seed=0, workers=None):
+    """Runs several seeded ordering heuristics in parallel and returns the width, ordering, bags and cover of the best.
+    The first start is the deterministic min-degree heuristic, the others cycle through min-degree, min-fill and maximum
+    cardinality search with random tie breaking."""
+    variants = [("degree", seed, False)]
+    criteria = ("degree", "fill", "mcs")
+    for i in range(1, starts):
+        variants.append((criteria[i % len(criteria)], seed + i, True))
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(_run_variant, repeat(g), repeat(htd), *zip(*variants)))
+
+    # Ties are broken by the position of the variant, which keeps the result reproducible
+    _, idx = min((x[0], i) for i, x in enumerate(results))
+    return results[idx]
+
+
+def cover_width(g, pg, ordering, htd):
+    """Returns the width of the greedy cover of the decomposition induced by the ordering, together with the number of
+    bags of that width"""
+    bags, tree, _ = ordering_to_decomp(pg, ordering)
+    simplify_decomp(bags, tree)
+    edge_cover = _cover(g, bags, tree, htd)
+
+    widths = [sum(v.values()) for v in edge_cover.values()]
+    width = max(widths, default=0)
+    return width, widths.count(width)
+
+
+def local_search(g, htd, budget=10, seed=None, ordering=None, temperature=0.3, window=5):
+    """Simulated annealing over elimination orderings that minimizes the cover width. Runs for budget seconds and
+    returns the best width found."""
+    rnd = Random(seed)
+
+    pg = Graph()
+    for e in g.edges():
+        for u, v in combinations(g.get_edge(e), 2):
+            pg.add_edge(u, v)
+
+    if ordering is None:
+        ordering = compute_ordering(pg)
+    ordering = list(ordering)
+    n = len(ordering)
+
+    def cost(c_ordering):
+        width, cnt = cover_width(g, pg, c_ordering, htd)
+        # Fewer bags of maximum width make a reduction of the width more likely
+        return width + cnt / (n + 1)
+
+    c_cost = cost(ordering)
+    best = c_cost
+    if n < 2:
+        return int(best)
+
+    tm_start = time.time()
+    while True:
+        elapsed = time.time() - tm_start
+        if elapsed >= budget:
+            break
+
+        # Move a vertex to a close position, occasionally to an arbitrary position
+        i = rnd.randrange(n)
+        if rnd.random() < 0.1:
+            j = rnd.randrange(n)
+        else:
+            j = min(n - 1, max(0, i + rnd.randint(-window, window)))
+        if i == j:
+            continue
+
+        candidate = list(ordering)
+        candidate.insert(j, candidate.pop(i))
+
+        n_cost = cost(candidate)
+        c_temperature = temperature * (1.0 - elapsed / budget)
+        if n_cost <= c_cost or rnd.random() < exp((c_cost - n_cost) / c_temperature):
+            ordering = candidate
+            c_cost = n_cost
+            best = min(best, c_cost)
+
+    return int(best)
+
+
 def ordering_to_decomp(pg, ordering):
     """Converts an elimination ordering into a decomposition"""
 
@@ -100,155 +373,130 @@ def ordering_to_decomp(pg, ordering):
 
 def simplify_decomp(bags, tree, cover=None):
     """Simplifies the decomposition by eliminating subsumed bags. This usually results in fewer bags."""
-    # Eliminate subsumed bags
-    cnt = 0
-    changed = True
-
-    while changed:
-        changed = False
-
-        for n in list(tree.nodes):
-            nb = list(tree.succ[n])
-            nb.extend(tree.pred[n])
-
-            nbag = bags[n]
-            for u in nb:
-                if bags[u].issubset(nbag) or bags[u].issuperset(nbag):
-                    cnt += 1
-                    for v in tree.succ[n]:
-                        if u != v:
-                            tree.add_edge(u, v)
-                    for v in tree.pred[n]:
-                        if u != v:
-                            tree.add_edge(v, u)
-                    if bags[u].issubset(nbag):
-                        bags[u] = nbag
-                        if cover:
-                            cover[u] = cover[n]
-
+    # Bottom-up, every node is merged into its parent if one bag contains the other. The parent keeps its id and takes
+    # the larger bag, as the cover of HTDs relates node ids to the eliminated vertices. A single pass suffices: a vertex
+    # in a child's bag but not in its parent's bag cannot be added to the parent later, as bags are connected.
+    group = {}
+
+    def find(n):
+        while group[n] != n:
+            group[n] = group[group[n]]
+            n = group[n]
+        return n
+
+    # Reversed preorder, children precede their parents
+    order = []
+    stack = [n for n in tree.nodes if tree.in_degree(n) == 0]
+    while stack:
+        n = stack.pop()
+        order.append(n)
+        stack.extend(tree.succ[n])
+    order.reverse()
+
+    for n in order:
+        group[n] = n
+
+    # The parent of n is processed after n, hence both still represent their groups
+    for n in order:
+        for p in tree.pred[n]:
+            if bags[n] <= bags[p] or bags[p] < bags[n]:
+                group[n] = p
+                if bags[p] < bags[n]:
+                    bags[p] = bags[n]
                     if cover:
-                        cover.pop(n)
-                    bags.pop(n)
-                    tree.remove_node(n)
-                    changed = True
-                    break
+                        cover[p] = cover[n]
 
+    edges = [(find(u), find(v)) for u, v in tree.edges if find(u) != find(v)]
+    removed = [n for n in order if find(n) != n]
+    tree.remove_nodes_from(removed)
+    tree.add_edges_from(edges)
+    for n in removed:
+        bags.pop(n)
+        if cover:
+            cover.pop(n)
 
-def cover_ghtd(g, bags):
-    edge_cover = {n: {e: 0 for e in g.edges().keys()} for n in g.nodes()}
 
-    for k, v in bags.items():
-        remaining = set(v)
-
-        # cover bag, minimize cost per covered vertex
-        while len(remaining) > 0:
-            c_best = (0.0, None, None)
-            for e, ed in g.edges().items():
-                ed = set(ed)
-
-                intersect = len(remaining & ed)
-                if intersect > c_best[0]:
-                    c_best = (intersect, e, ed)
-
-            _, e, ed = c_best
-            remaining -= ed
-            edge_cover[k][e] = 1
-
-    return edge_cover
+def cover_ghtd(g, bags):
+    """Greedily covers every bag, the cover is sparse and only contains the chosen edges"""
+    index = cover_index(g)
+    return {k: index.cover(v) for k, v in bags.items()}
 
 
 def cover_htd(g, bags, tree, root):
-    q1 = [root]
-    q2 = []
-
-    edge_cover = {n: {e: 0 for e in g.edges().keys()} for n in tree.nodes}
-    while q1 or q2:
-        if not q1:
-            q1 = q2
-            q2 = []
-
-        n = q1.pop()
+    """Greedily covers the bags of the tree below root top-down. Edges that pull the fewest vertices into descendant
+    bags are preferred, these vertices are added to the bags on the path. The bags are extended in place, the cover is
+    sparse."""
+    index = cover_index(g)
+
+    # Euler tour, m is below n iff tin[n] < tin[m] <= tout[n]. The preorder ensures that parents are covered first
+    tin = {}
+    tout = {}
+    parent = {root: None}
+    preorder = []
+    # The topmost node containing each vertex, as bags are connected a vertex occurs below n but not in n iff its
+    # topmost node is below n
+    top = {}
+    stack = [(root, False)]
+    while stack:
+        n, done = stack.pop()
+        if done:
+            tout[n] = len(preorder) - 1
+            continue
+
+        tin[n] = len(preorder)
+        preorder.append(n)
+        for v in bags[n]:
+            top.setdefault(v, n)
+        stack.append((n, True))
         for u in tree.successors(n):
-            q2.append(u)
+            parent[u] = n
+            stack.append((u, False))
 
-        bag = bags[n]
-        desc = set(descendants(tree, n))
+    def below(u, n):
+        return u in top and tin[n] < tin[top[u]] <= tout[n]
 
-        while len(bag) > 0:
-            c_best = (0, maxsize, None, None)
-            for e, ed in g.edges().items():
-                ed = set(ed)
+    # The vertices that are not yet covered, including the ones pulled in from above
+    uncovered = {n: set(bags[n]) for n in preorder}
+    edge_cover = {n: {} for n in preorder}
+    for n in preorder:
+        bag = uncovered[n]
 
-                intersect = len(bag & ed)
-                remainder = len((ed - bag) & desc)
+        while len(bag) > 0:
+            bag_bits = 0
+            candidates = set()
+            for v in bag:
+                bag_bits |= 1 << v
+                candidates.update(index.incident.get(v, ()))
+
+            c_best = (0, maxsize, None)
+            for e in sorted(candidates, key=index.position.get):
+                intersect = popcount(bag_bits & index.bits[e])
+                remainder = sum(1 for u in g.get_edge(e) if u not in bag and below(u, n))
                 # Try to fill the bag with as few problematic vertices as possible
-                # if intersect > c_best[0] or (intersect == c_best[0] and remainder < c_best[1]):
-                if intersect > 0 and (
-                        remainder < c_best[1] or (remainder == c_best[1] and intersect > c_best[0])):
-                    c_best = (intersect, remainder, e, ed)
+                if remainder < c_best[1] or (remainder == c_best[1] and intersect > c_best[0]):
+                    c_best = (intersect, remainder, e)
 
-            _, _, e, ed = c_best
-            bag -= ed
+            _, _, e = c_best
+            bag -= set(g.get_edge(e))
             edge_cover[n][e] = 1
 
-            for u in (ed - bag) & desc:
-                for v in shortest_path(tree, n, u):
-                    if v != n:
+            for u in g.get_edge(e):
+                if below(u, n):
+                    v = top[u]
+                    while v != n:
                         bags[v].add(u)
+                        uncovered[v].add(u)
+                        v = parent[v]
+                    # The special condition requires u in the bag of n, where it is covered by e
+                    bags[n].add(u)
 
     return edge_cover
 
 
-def bandb(g, bags, cover):
-    """Tries to improve a given cover, by computing the optimal cover via branch and bound"""
-
-    w = g.weights() if g.weights else None
-
-    def bb_rec(b, edges, c, pos, val, ub):
-        """Recursive function that computes the cover. Use pos=-1 and value False for call. Returns maxsize of no better
-        solution could be found."""
-
-        # Reached the end, but did not fill the bag...
-        if pos == len(edges):
-            return maxsize, None
-
-        nb = b
-        nc = c
-
-        # If we should add the edge, add costs and remove from bag
-        if val:
-            e, ed = edges[pos]
-
-            # Hyperedge does not contribute anything, adding it cannot be optimal
-            if len(ed & b) == 0:
-                return maxsize, None
-
-            nc = c + w[e] if w else c + 1
-
-            # Exceed upper bound -> suboptimal
-            if nc >= ub:
-                return maxsize, None
-
-            nb = b - ed
-            # Found a solution, that is cheaper, return
-            if len(nb) == 0:
-                return nc, [e]
-
-        # Subcalls
-        res1 = bb_rec(nb, edges, nc, pos + 1, True, ub)
-        res2 = bb_rec(nb, edges, nc, pos + 1, False, min(ub, res1[0]))
-
-        # Retain the minimal found solution and return it, if it is an improvement
-        res = min(res1, res2)
-
-        if res[0] < ub:
-            if val:
-                res[1].append(edges[pos][0])
-
-            return res
-
-        # Default return in case the solution is not an improvement
-        return maxsize, None
+def bandb(g, bags, cover, limit=None):
+    """Tries to improve a given cover, by computing the optimal cover via branch and bound. Limit bounds the number of
+    search nodes per bag"""
+    index = cover_index(g, g.weights())
 
     # Not execute the B&B for every bag. First calculate the width and process in reverse order
     # Using this ordering, we can stop whenever we cannot improve a bag, as subsequent improvement will not
@@ -264,17 +512,11 @@ def bandb(g, bags, cover):
         if b_ub <= c_global_ub:
             return
 
-        # Filter out only those edges that may cover the bag. This may be inefficient...
-        relevant_edges = [(e, set(ed) & v) for e, ed in g.edges().items() if len(set(ed) & v) > 0]
-        # Start recursive call
-        res = bb_rec(v, relevant_edges, 0, -1, False, b_ub)
-
         # Apply new cover if better
-        if res[0] < b_ub:
-            if w:
-                cover[k] = {e: w[e] for e in res[1]}
-            else:
-                cover[k] = {e: 1 for e in res[1]}
+        res = index.exact_cover(v, b_ub, limit)
+        if res is not None:
+            cover[k] = res
+            b_ub = sum(res.values())
 
         # This is valid due to the sort order
-        c_global_ub = min(res[0], b_ub)
+        c_global_ub = b_ub
@@ -1,9 +1,36 @@
+import sys
 
 
 class DecompositionResult:
-    def __init__(self, size, decomposition, arcs, ordering, weights):
+    def __init__(self, size, decomposition, arcs, ordering, weights, backend=None, runtimes=None, failed=None):
         self.size = size
         self.decomposition = decomposition
+        # Sparse: arcs only contains the true arcs, weights only the chosen edges of each bag
         self.arcs = arcs
         self.ordering = ordering
         self.weights = weights
+        # The backend that found the result in a portfolio run, the runtimes of all backends and the failed backends
+        self.backend = backend
+        self.runtimes = runtimes
+        self.failed = failed
+
+    def write(self, mode, ostream=sys.stdout):
+        """Writes the decomposition, the edge function is written sparse, i.e. without zero weights"""
+        td = self.decomposition
+        ostream.write(f"s {mode} {len(td.bags)} {self.size} {len(td.hypergraph.nodes())} {len(td.hypergraph.edges())}\n")
+
+        # Output bags
+        for k, v in td.bags.items():
+            ostream.write("b {} {}\n".format(k, " ".join((str(x) for x in v))))
+        ostream.write("\n")
+
+        # Output edges
+        for u, v in td.tree.edges:
+            ostream.write(f"{u} {v}\n")
+        ostream.write("\n")
+
+        # Output edge function
+        for k, v in td.hyperedge_function.items():
+            for k2, v2 in v.items():
+                if v2 != 0:
+                    ostream.write(f"w {k} {k2} {v2}\n")
@@ -96,20 +96,32 @@ class Decomposition(object):
             ordering = sorted(hypergraph.nodes())
 
         tree = nx.DiGraph()
-        smallest = lambda A: min([(ordering.index(xi), xi) for xi in A])
+        # positions are precomputed, ordering.index is linear
+        position = {v: i for i, v in enumerate(ordering)}
+        smallest = lambda A: min([(position[xi], xi) for xi in A])
 
         if edges is None:
             nxtn = lambda v, A: smallest(A)[1]
         else:
-            nxtn = lambda v, A: \
-                next(iter([x[0] for x in edges if x[1] == v] + [None]))
+            parents = {}
+            for x in edges:
+                parents.setdefault(x[1], x[0])
+            nxtn = lambda v, A: parents.get(v)
 
         # initialize with empty bags
         chi = {v: set() for v in hypergraph.nodes()}
         tree.add_nodes_from(range(1, hypergraph.number_of_nodes() + 1))
 
-        for e in hypergraph.edges():
-            chi[smallest(e)[1]].update(e)
+        # every primal edge adds both endpoints to the bag of the earlier one. The hyperedges of a primal view are
+        # used directly, as the view computes its edges from the adjacency of every vertex
+        if isinstance(hypergraph, HypergraphPrimalView):
+            cliques = hypergraph.hg.edges().values()
+        else:
+            cliques = hypergraph.edges()
+        for e in cliques:
+            e = sorted(set(e), key=position.get)
+            for i in range(len(e) - 1):
+                chi[e[i]].update(e[i:])
 
         for v in ordering:
             # copy
@@ -316,9 +328,11 @@ class Decomposition(object):
     def edges_covered(self):
         # initialise with edges
         # TODO: something missing here
-        covered_edges = {e: False for e in self.hypergraph.edges_iter()}
+        vertex2bags = self.bag_occuences()
         for e in self.hypergraph.edges_iter():
-            if not any(set(e) <= bag for bag in self.bags.values()):
+            # only the bags containing a vertex of the edge can cover it
+            candidates = vertex2bags.get(next(iter(e)), ()) if len(e) > 0 else self.bags.keys()
+            if not any(set(e) <= self.bags[n] for n in candidates):
                 logging.error('Edge "%s" is not covered in any bag.' % str(e))
                 return False
         return True
@@ -343,8 +357,19 @@ class Decomposition(object):
 
     def is_connected(self):
         vertex2bags = self.bag_occuences()
+        # in a forest, the nodes containing v are connected iff there is one tree edge less than nodes between them.
+        # The subgraph is only checked for the other vertices
+        components = {}
+        if len(self.tree) > 0 and nx.is_forest(self.tree):
+            components = {v: len(nodes) for v, nodes in vertex2bags.items()}
+            for u, w in self.tree.edges():
+                for v in self.bags.get(u, set()) & self.bags.get(w, set()):
+                    components[v] -= 1
+
         # print self.hypergraph.number_of_edges()
         for v in self.hypergraph.nodes_iter():
+            if components.get(v) == 1 and vertex2bags[v] <= self.tree.nodes:
+                continue
             logging.debug("vertex %s" % v)
             SG = self.tree.subgraph(vertex2bags[v])
             if not nx.is_connected(SG.to_undirected()):
@@ -127,42 +127,46 @@ class GeneralizedHypertreeDecomposition(Decomposition):
 
     def _B(self, t):
         logging.info("Computing bag condition B(lambda_t) for node %s" % t)
-        ret = set()
         # {v \in V(H) : (sum_{e \in E(H), v \in e} lambda_u(e)) \geq 1 } =>
         # {v : v \in V(H), (sum{lambda_u(e) : e \in E(H), v \in e}) \geq 1 }
-        # TODO: This has originally been designed for fractional case, i.e. summing up the weights works, but
-        # is unnecessary
-        for v in self.hypergraph.nodes():
-            logging.info('v = %s' % v)
-            # e \in E(H), v \in e: self._edge_ids_where_v_occurs(v)
-            # lambda_u_e_v: {lambda_u(e) : e \in E(H), v \in e}
-            lambda_u_e_v = list(map(lambda e: self.hyperedge_function[t][e] if e in self.hyperedge_function[t] else 0,
-                               self._edge_ids_where_v_occurs(v)))
-            logging.info('lambda(%s) = %s' % (t, lambda_u_e_v))
-            logging.info('sum(%s) = %s' % (t, str(sum(lambda_u_e_v))))
-            bag_sum = sum(map(lambda x: Decimal(x), lambda_u_e_v)) + Decimal(self.epsilon)
-            logging.info("sum_prec(%s)=%s" % (v, str(bag_sum)))
-            logging.info("  @Epsilon=%s" % self.epsilon)
+        # only the vertices of edges with non-zero weight can reach 1, the sums are collected along these edges
+        edges = self.hypergraph.edges()
+        weights = [(e, w) for e, w in self.hyperedge_function[t].items() if w != 0 and e in edges]
+
+        # integral weights are summed exactly, the epsilon is only required for fractional weights
+        integral = all(isinstance(w, int) or float(w).is_integer() for _, w in weights)
+        sums = defaultdict(int if integral else Decimal)
+        for e, w in weights:
+            for v in edges[e]:
+                sums[v] += int(w) if integral else Decimal(w)
+
+        if integral:
+            ret = {v for v, bag_sum in sums.items() if bag_sum >= 1}
+        else:
             # REQUIRED DUE TO FLOATING POINT ISSUES
             # see: https://docs.python.org/2/tutorial/floatingpoint.html
             # TODO: If the weights are smaller than one, this causes problems
-            if bag_sum >= 1:
-                ret.add(v)
+            ret = {v for v, bag_sum in sums.items() if bag_sum + Decimal(self.epsilon) >= 1}
         logging.info("B(lambda_%s) = '%s'" % (t, ret))
         return ret
 
+    def _bag_conditions(self):
+        return {t: self._B(t) for t in self.tree.nodes()}
+
     def max_bag_size(self):
         ret = 0
         for b in self.hyperedge_function.itervalues():
             ret = max(ret, sum(b.itervalues()))
         return ret
 
-    def edge_function_holds(self):
+    def edge_function_holds(self, conditions=None):
+        if conditions is None:
+            conditions = self._bag_conditions()
         for t in self.tree.nodes():
-            if not (self.bags[t] <= self._B(t)):
+            if not (self.bags[t] <= conditions[t]):
                 logging.error('Edge function property does not hold for node "%s"' % t)
                 logging.error(
-                    'Bag contains: "%s" while vertices from edge functions were "%s"' % (self.bags[t], self._B(t)))
+                    'Bag contains: "%s" while vertices from edge functions were "%s"' % (self.bags[t], conditions[t]))
                 return False
         return True
 
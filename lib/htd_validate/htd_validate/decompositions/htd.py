@@ -3,6 +3,7 @@ from io import StringIO
 
 from .ghtd import GeneralizedHypertreeDecomposition
 from ..utils import Hypergraph, HypergraphPrimalView
+import networkx as nx
 from networkx.algorithms.traversal.depth_first_search import dfs_tree
 
 
@@ -50,19 +51,52 @@ class HypertreeDecomposition(GeneralizedHypertreeDecomposition):
 
         return False
 
-    def inverse_edge_function_holds(self):
+    def inverse_edge_function_holds(self, conditions=None):
         logging.info('=' * 80)
         logging.info('Inverse edge function property')
         logging.info('=' * 80)
-        for u in self.tree.nodes:
+        if conditions is None:
+            conditions = self._bag_conditions()
+
+        # the vertices below every node are collected bottom-up in one pass, as bitsets. This requires a rooted forest,
+        # otherwise the subtree of every node is searched
+        if len(self.tree) > 0 and nx.is_forest(self.tree) and all(d <= 1 for _, d in self.tree.in_degree()):
+            index = {}
+
+            def bits(vertices):
+                ret = 0
+                for v in vertices:
+                    ret |= 1 << index.setdefault(v, len(index))
+                return ret
+
+            order = []
+            stack = [u for u, d in self.tree.in_degree() if d == 0]
+            while stack:
+                u = stack.pop()
+                order.append(u)
+                stack.extend(self.tree.successors(u))
+
+            below = {}
+            failed = []
+            for u in reversed(order):
+                below[u] = bits(self.bags[u])
+                for t in self.tree.successors(u):
+                    below[u] |= below.pop(t)
+                if below[u] & bits(conditions[u]) & ~bits(self.bags[u]):
+                    failed.append(u)
+                    break
+        else:
+            failed = self.tree.nodes
+
+        for u in failed:
             T_u = dfs_tree(self.tree, u)
             vertices_in_bags_below_u = set()
             for t in T_u.nodes():
                 vertices_in_bags_below_u.update(self.bags[t])
-            if not (vertices_in_bags_below_u & self._B(u) <= self.bags[u]):
+            if not (vertices_in_bags_below_u & conditions[u] <= self.bags[u]):
                 logging.error('Inverse edge function property does not hold for node "%s"' % u)
                 logging.error('Bag of the subtree induced at "%s" contained "%s"' % (u, vertices_in_bags_below_u))
-                logging.error('Vertices returned from the edge function are "%s"' % self._B(u))
+                logging.error('Vertices returned from the edge function are "%s"' % conditions[u])
                 logging.error('Bag content is: %s' % self.bags[u])
                 logging.error(
                     'Hence, not (vertices_in_bags_below_u & self._B(u) <= self.bags[u]) does not hold for node %s.' % u)
@@ -73,9 +107,13 @@ class HypertreeDecomposition(GeneralizedHypertreeDecomposition):
 
     def validate(self, graph, strict=True):
         self.hypergraph = graph
-        if self.is_tree(
-                strict=strict) and self.edges_covered() and self.is_connected() and self.edge_function_holds() and \
-                self.inverse_edge_function_holds():
+        if not (self.is_tree(strict=strict) and self.edges_covered() and self.is_connected()):
+            logging.error('ERROR in Tree Decomposition.')
+            return False
+
+        # the bag conditions are shared by both edge function checks
+        conditions = self._bag_conditions()
+        if self.edge_function_holds(conditions) and self.inverse_edge_function_holds(conditions):
             return True
         else:
             logging.error('ERROR in Tree Decomposition.')
@@ -444,10 +444,12 @@ class Hypergraph(object):
         problem = cx.Cplex()
         problem.objective.set_sense(problem.objective.sense.minimize)
 
-        names = ["e{0}".format(e) for e in self.edges()]
+        # dominated edges can be replaced in every cover, the full list is kept for the empty bag
+        edges = self.dominant_edges(verts) if len(verts) > 0 else dict(self.edges())
+        names = ["e{0}".format(e) for e in edges]
         # coefficients
-        problem.variables.add(obj=[1] * len(self.edges()),
-                              lb=[0] * len(self.edges()),
+        problem.variables.add(obj=[1] * len(edges),
+                              lb=[0] * len(edges),
                               # ub=upper_bounds,
                               names=names)
 
@@ -455,8 +457,9 @@ class Hypergraph(object):
         constraints = []
         for k in verts:
             constraint = []
-            for e in self.incident_edges(k):
-                constraint.append("e{0}".format(e))
+            for e, ge in edges.items():
+                if k in ge:
+                    constraint.append("e{0}".format(e))
             if len(constraint) > 0:
                 constraints.append([constraint, [1] * len(constraint)])
 
@@ -485,6 +488,26 @@ class Hypergraph(object):
         return problem.solution.get_objective_value()
         # print problem.solution.get_values()
 
+    def dominant_edges(self, verts, weights=None):
+        """Returns the edges incident to verts, whose intersection with verts is not contained in the intersection of
+        another edge at no higher weight, mapped to the intersection. Of equal edges, the first one is kept."""
+        verts = set(verts)
+        intersections = {}
+        for e, ge in self.__edges.items():
+            intersection = verts.intersection(ge)
+            if len(intersection) > 0:
+                intersections[e] = intersection
+
+        def weight(e):
+            return 1 if weights is None else weights[e]
+
+        edges = {}
+        # stable sort, larger and cheaper intersections may dominate the following ones
+        for e in sorted(intersections, key=lambda x: (-len(intersections[x]), weight(x))):
+            if not any(intersections[e] <= ge and weight(k) <= weight(e) for k, ge in edges.items()):
+                edges[e] = intersections[e]
+        return edges
+
     # @staticmethod
     # def project_edge(e, p):
     #    return [x for x in e if x not in p]
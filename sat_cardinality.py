@@ -0,0 +1,113 @@
+from pysat.card import ITotalizer, CardEnc, EncType
+
+try:
+    from pysat.pb import PBEnc
+except (ImportError, AssertionError):
+    # pysat asserts on import if pypblib is missing
+    PBEnc = None
+
+"""Backends for the width constraint of the SAT encoding, i.e. every bag is covered by at most bound edges"""
+
+
+class TotalizerWidth:
+    """One iterative totalizer per bag, bounds are selected by assuming the negated output literals"""
+
+    def __init__(self, pool, bags, ub):
+        self.pool = pool
+        self.tots = []
+        self.pending = []
+        self.nof_clauses = 0
+        self.top_id = 0
+
+        for i, lits in bags.items():
+            ubound = min(len(lits)-1, ub)
+
+            self.tots.append(ITotalizer(lits=lits, ubound=ubound, top_id=self.pool.id(f"totalizer{i}")))
+            self.pool.occupy(self.pool.top - 1, self.tots[-1].top_id)
+            self.pending.extend(self.tots[-1].cnf.clauses)
+            self.top_id = max(self.top_id, self.tots[-1].top_id)
+
+    def bound(self, bound):
+        """Returns the new clauses and the assumptions that restrict every bag to at most bound edges"""
+        clauses = self.pending
+        self.pending = []
+
+        for c_tot in self.tots:
+            if c_tot.ubound < bound < len(c_tot.lits):
+                c_tot.increase(ubound=bound, top_id=self.pool.id(f"tots_{self.pool.top}"))
+                clauses.extend(c_tot.cnf.clauses[-c_tot.nof_new:])
+                self.pool.occupy(self.pool.top - 1, c_tot.top_id)
+                self.top_id = max(self.top_id, c_tot.top_id)
+
+        self.nof_clauses += len(clauses)
+        return clauses, [-t.rhs[bound] for t in self.tots if bound < len(t.lits)]
+
+
+class GuardedWidth:
+    """Encodes a fixed-bound constraint for every bag once a bound is requested. All bags share a selector literal
+    per bound, the clauses of a bound are only active if its selector is assumed.
+
+    Unlike the iterative totalizer, the fixed-bound encodings of pysat cannot be extended to another bound, hence
+    every new bound adds a new encoding. Only the encoding of the current bound is kept active, the selectors of
+    previous bounds are fixed to false, so that the solver can discard their clauses."""
+
+    def __init__(self, pool, bags, encoding, pb=False):
+        if pb and PBEnc is None:
+            raise RuntimeError("Pseudo-Boolean encodings require pypblib")
+
+        self.pool = pool
+        self.bags = list(bags.values())
+        self.encoding = encoding
+        self.pb = pb
+        self.selectors = {}
+        self.nof_clauses = 0
+        self.top_id = 0
+
+    def bound(self, bound):
+        """Returns the new clauses and the assumptions that restrict every bag to at most bound edges"""
+        if bound in self.selectors:
+            return [], [self.selectors[bound]]
+
+        # Retire the previous bounds, they are encoded anew if they are requested again
+        clauses = [[-x] for x in self.selectors.values()]
+        self.selectors.clear()
+        sel = self.pool.id()
+        self.selectors[bound] = sel
+
+        for lits in self.bags:
+            # Trivially satisfied
+            if len(lits) <= bound:
+                continue
+
+            if self.pb:
+                constr = PBEnc.atmost(lits, bound=bound, vpool=self.pool, encoding=self.encoding)
+            else:
+                constr = CardEnc.atmost(lits, bound=bound, vpool=self.pool, encoding=self.encoding)
+            clauses.extend([-sel] + cl for cl in constr.clauses)
+
+        self.nof_clauses += len(clauses)
+        self.top_id = self.pool.top
+        return clauses, [sel]
+
+
+# Names of the available backends, the PB encodings (best, bdd, seqcounter, sortnetwrk, adder, binmerge) use the
+# values of pysat.pb.EncType
+backends = {
+    "tot": lambda pool, bags, ub: TotalizerWidth(pool, bags, ub),
+    "mtot": lambda pool, bags, ub: GuardedWidth(pool, bags, EncType.mtotalizer),
+    "kmtot": lambda pool, bags, ub: GuardedWidth(pool, bags, EncType.kmtotalizer),
+    "cardnet": lambda pool, bags, ub: GuardedWidth(pool, bags, EncType.cardnetwrk),
+    "sortnet": lambda pool, bags, ub: GuardedWidth(pool, bags, EncType.sortnetwrk),
+    "seqcounter": lambda pool, bags, ub: GuardedWidth(pool, bags, EncType.seqcounter),
+    "pb": lambda pool, bags, ub: GuardedWidth(pool, bags, 0, pb=True),
+    "pbbdd": lambda pool, bags, ub: GuardedWidth(pool, bags, 1, pb=True),
+    "pbadder": lambda pool, bags, ub: GuardedWidth(pool, bags, 4, pb=True),
+}
+
+
+def create(name, pool, bags, ub):
+    """Creates the width constraint backend name for the bags, a map from vertex to its weight literals"""
+    if name not in backends:
+        raise ValueError(f"Unknown width constraint backend {name}")
+
+    return backends[name](pool, bags, ub)
@@ -3,6 +3,9 @@ from pysat.formula import IDPool, CNF, WCNF
 from pysat.card import ITotalizer, CardEnc, EncType
 from lib.htd_validate.htd_validate.decompositions import HypertreeDecomposition
 from decomposition_result import DecompositionResult
+from tree_repair import build_tree
+import sat_cardinality
+from sat_simplifier import CnfSimplifier
 from functools import cmp_to_key
 import networkx as nx
 import subprocess
@@ -16,6 +19,8 @@ class HtdSatEncoding:
         self.hypergraph = hypergraph
         self.formula = CNF()
         self.pool = IDPool()
+        self.width_constraint = None
+        self.simplifier = None
         #self.log_file = open("sat_encoding.log", "w")
 
         n = self.hypergraph.number_of_nodes()
@@ -151,6 +156,30 @@ class HtdSatEncoding:
 
         return tots
 
+    def restrict_weights(self, htd):
+        """Forbids covering a bag by edges outside the bag's connected component, as these cannot cover any vertex of
+        the bag. For GHTDs, edges contained in another edge are forbidden as well, as the containing edge can replace
+        them in every cover. Returns the weight literals of the remaining edges for every bag."""
+        pg = nx.Graph()
+        pg.add_nodes_from(self.hypergraph.nodes())
+        for e in self.hypergraph.edges():
+            nx.add_path(pg, self.hypergraph.get_edge(e))
+
+        bags = {}
+        for comp in nx.connected_components(pg):
+            if htd:
+                edges = {e for e, ed in self.hypergraph.edges().items() if ed[0] in comp}
+            else:
+                # The special condition of HTDs may rule out the containing edge
+                edges = set(self.hypergraph.dominant_edges(comp))
+            for i in comp:
+                bags[i] = [self.weight[i][ej] for ej in sorted(edges)]
+                for ej in self.hypergraph.edges():
+                    if ej not in edges:
+                        self._add_clause(-self.weight[i][ej])
+
+        return bags
+
     def _symmetry_breaking(self, n):
         ls = {x: self.pool.id(f"ls{x}") for x in range(1, n+1)}
         s = {x: {} for x in range(1, n+1)}
@@ -177,7 +206,8 @@ class HtdSatEncoding:
 
             self.formula.append(clause)
 
-    def solve(self, ub, htd, solver, incremental=True, enc_type=EncType.totalizer, sb=False, clique=None, maxsat=False, tmpdir=None):
+    def solve(self, ub, htd, solver, incremental=True, enc_type=EncType.totalizer, sb=False, clique=None, maxsat=False, tmpdir=None,
+              width_backend="tot", simplify=False, lb=None):
         n = self.hypergraph.number_of_nodes()
         m = self.hypergraph.number_of_edges()
         self._init_vars(htd)
@@ -195,38 +225,35 @@ class HtdSatEncoding:
             ub = m
 
         c_bound = ub
-        increase = False
-        c_lb = 0
+        # Widths below the lower bound are never searched, a model is still required if the bounds meet
+        c_lb = lb if lb else 0
+        best_model = None
 
         # TODO: Once we have solved the formula once, assumptions can be added as clauses
         if incremental:
-            tots = self._encode_cardinality(ub, m, n)
+            self.width_constraint = sat_cardinality.create(width_backend, self.pool, self.restrict_weights(htd), ub)
+            formula = self.simplify() if simplify else self.formula
             with solver() as slv:
-                slv.append_formula(self.formula)
+                slv.append_formula(formula)
 
-                while c_lb < ub:
-                    if increase:
-                        for c_tot in tots:
-                            c_tot.increase(ubound=c_bound, top_id=self.pool.id(f"tots_{self.pool.top}"))
-                            slv.append_formula(c_tot.cnf.clauses[-c_tot.nof_new:])
-                            self.pool.occupy(self.pool.top - 1, tots[-1].top_id)
+                while c_lb < ub or best_model is None:
+                    clauses, assps = self.width_constraint.bound(c_bound)
+                    slv.append_formula(clauses)
 
-                    assps = [-t.rhs[c_bound] for t in tots if c_bound < len(t.lits)]
                     if slv.solve(assumptions=assps):
                         ub = c_bound
                         c_bound -= 1
-                        best_model = self.decode(slv.get_model(), htd, m, n)
+                        best_model = self.decode(self._model(slv.get_model()), htd, m, n)
                     else:
                         c_lb = c_bound + 1
                         c_bound += 1
-                        increase = True
                 return best_model
         elif not maxsat:
-            best_model = None
+            formula = self.simplify() if simplify else self.formula
 
-            while c_lb < ub:
+            while c_lb < ub or best_model is None:
                 with solver() as slv:
-                    slv.append_formula(self.formula)
+                    slv.append_formula(formula)
                     c_top = self.pool.top
                     for i in range(1, n + 1):
                         lits = [self.weight[i][ej] for ej in range(1, m + 1)]
@@ -238,7 +265,7 @@ class HtdSatEncoding:
                     if slv.solve():
                         ub = c_bound
                         c_bound -= 1
-                        best_model = self.decode(slv.get_model(), htd, m, n)
+                        best_model = self.decode(self._model(slv.get_model()), htd, m, n)
                     else:
                         c_lb = c_bound + 1
                         c_bound += 1
@@ -268,6 +295,19 @@ class HtdSatEncoding:
                     model = [int(x) for x in cline.split()[1:]]
                     return self.decode(model, htd, m, n)
 
+    def simplify(self):
+        """Simplifies the encoding, the weights are frozen as the width constraints refer to them"""
+        n = self.hypergraph.number_of_nodes()
+        decoded = [self.arc[i][j] for i in range(1, n+1) for j in range(1, n+1) if i != j]
+        decoded.extend(self.ord[i][j] for i in range(1, n+1) for j in range(i+1, n+1))
+        weights = [x for i in range(1, n+1) for x in self.weight[i].values()]
+
+        self.simplifier = CnfSimplifier(self.formula.clauses, frozen=weights, protected=decoded)
+        return self.simplifier.simplify()
+
+    def _model(self, model):
+        return self.simplifier.extend(model) if self.simplifier else model
+
     def decode(self, model, htd, m, n):
         model = {abs(x): x > 0 for x in model}
         ordering = list(range(1, n + 1))
@@ -279,46 +319,15 @@ class HtdSatEncoding:
                 return 1 if model[self.ord[y][x]] else -1
         ordering.sort(key=cmp_to_key(find_ord))
 
-        weights = {x: {ej: 1 if model[self.weight[x][ej]] else 0 for ej in range(1, m+1)} for x in range(1, n+1)}
-        arcs = {x: {y: model[self.arc[x][y]] for y in range(1, n+1) if x != y} for x in range(1, n+1)}
+        # Sparse, only the chosen edges and the true arcs are stored
+        weights = {x: {ej: 1 for ej in range(1, m+1) if model[self.weight[x][ej]]} for x in range(1, n+1)}
+        arcs = {x: {y: True for y in range(1, n+1) if x != y and model[self.arc[x][y]]} for x in range(1, n+1)}
 
         htdd = HypertreeDecomposition.from_ordering(hypergraph=self.hypergraph, ordering=ordering,
                                                     weights=weights)
 
         if htd:
-            for i in range(1, self.hypergraph.number_of_nodes() + 1):
-                for j in range(1, self.hypergraph.number_of_nodes() + 1):
-                    if i != j and arcs[i][j]:
-                        htdd.bags[i].add(j)
-
-            htdd.tree = nx.DiGraph()
-            for i in range(0, len(ordering)):
-                n = ordering[i]
-                for j in range(i + 1, len(ordering)):
-                    v = ordering[j]
-                    if arcs[n][v]:
-                        htdd.tree.add_edge(v, n)
-                        break
-
-            # TODO: This is really inefficient
-            root = [n for n in htdd.tree.nodes if len(list(htdd.tree.predecessors(n))) == 0][0]
-            q = [root]
-            while q:
-                n = q.pop()
-                q.extend(list(htdd.tree.successors(n)))
-                desc = set(nx.descendants(htdd.tree, n))
-
-                # Omitted intersected with descendants
-                problem = (htdd._B(n) - htdd.bags[n]) & desc
-                while problem:
-                    d = problem.pop()
-                    pth = nx.shortest_path(htdd.tree, source=n, target=d)
-                    pth.pop()
-                    while pth:
-                        c_node = pth.pop()
-
-                        # We know that every bag on the bath from n to d is a subset of d
-                        htdd.bags[c_node].update(htdd.bags[d])
+            build_tree(htdd, ordering, arcs)
 
         return DecompositionResult(htdd.width(), htdd, arcs, ordering, weights)
 
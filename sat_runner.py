@@ -4,13 +4,11 @@ import time
 import sys
 from lib.htd_validate.htd_validate.decompositions import GeneralizedHypertreeDecomposition
 
-from networkx import Graph
-from itertools import combinations
-from networkx.algorithms.approximation import max_clique
-from networkx.algorithms.clique import find_cliques
 from pysat.solvers import Glucose3, Glucose4, Lingeling, Cadical, Minisat22, Maplesat
 
 import bounds.upper_bounds as bnd
+import bounds.lower_bounds as lbnd
+from bounds.clique import max_clique
 from lib.htd_validate.htd_validate.utils.hypergraph import Hypergraph
 from sat_encoding import HtdSatEncoding
 
@@ -24,9 +22,20 @@ parser.add_argument('-s', dest="solver", default='0', type=int, help='The solver
 parser.add_argument('-b', dest="sb", default=False, action='store_true', help="Activate symmetry breaking")
 parser.add_argument('-i', dest="incr", default=False, action="store_true", help="Activate incremental solving")
 parser.add_argument('-c', dest="card", default=6, type=int, help="The cardinality encoding to use for non-incremental solving")
-parser.add_argument('-q', dest="clique", default=0, type=int, help="The clique mode (0: off, 1: approx, 2: max cliques)")
+parser.add_argument('-q', dest="clique", default=0, type=int,
+                    help="The clique mode (0: off, 1: max clique within a second, 2: max clique)")
 parser.add_argument('-t', dest="tmpdir", default="/tmp", type=str, help="The temporary directory to use")
 parser.add_argument('-m', dest="maxsat", default=False, action="store_true", help="Use MaxSAT")
+parser.add_argument('-p', dest="simplify", default=False, action="store_true",
+                    help="Simplify the CNF before solving (not supported with MaxSAT)")
+parser.add_argument('-w', dest="width", default="tot", type=str,
+                    help="The width constraint backend for incremental solving (tot, mtot, kmtot, cardnet, sortnet, "
+                         "seqcounter, pb, pbbdd, pbadder)")
+parser.add_argument('-l', dest="budget", default=0, type=float,
+                    help="Time budget in seconds for improving the upper bound by local search (0: off)")
+parser.add_argument('-e', dest="seed", default=None, type=int, help="The random seed for the local search")
+parser.add_argument('-k', dest="starts", default=1, type=int,
+                    help="Number of parallel seeded heuristics for the upper bound (1: single greedy run)")
 args = parser.parse_args()
 
 # The solver to use
@@ -48,26 +57,31 @@ if hypergraph_in is None or (hypergraph2 is not None and len(hypergraph2.edges()
     hypergraph_in = hypergraph2
 
 current_bound = bnd.greedy(hypergraph_in, False, bb=False)
+if args.starts > 1:
+    seed = args.seed if args.seed is not None else 0
+    current_bound = min(current_bound, bnd.multi_start(hypergraph_in, not args.ghtd, starts=args.starts, seed=seed)[0])
+if args.budget > 0:
+    current_bound = min(current_bound, bnd.local_search(hypergraph_in, not args.ghtd, budget=args.budget,
+                                                        seed=args.seed))
 timeout = 0
 before_tm = time.time()
 
 clique_mode = args.clique
 clique = None
 if clique_mode > 0:
-    pv = Graph()
-    for e in hypergraph_in.edges():
-        # PRIMAL GRAPH CONSTRUCTION
-        for u, v in combinations(hypergraph_in.get_edge(e), 2):
-            pv.add_edge(u, v)
+    # Mode 1 returns the best clique found within a second
+    clique = max_clique(hypergraph_in, timeout=1 if clique_mode == 1 else None)
 
-    if clique_mode == 1:
-        clique = max_clique(pv)
-    else:
-        clique = max(find_cliques(pv), key=lambda x: len(x))
+lower_bound = lbnd.lower_bound(hypergraph_in, clique)
 
 encoder = HtdSatEncoding(hypergraph_in)
 res = encoder.solve(current_bound, not args.ghtd, solver, sb=args.sb, incremental=args.incr, enc_type=args.card, clique=clique,
-                    maxsat=args.maxsat, tmpdir=args.tmpdir)
+                    maxsat=args.maxsat, tmpdir=args.tmpdir, width_backend=args.width,
+                    simplify=args.simplify, lb=lower_bound)
+
+if encoder.simplifier is not None:
+    for stage, clauses, literals, variables in encoder.simplifier.stats:
+        sys.stdout.write(f"Simplify {stage}: {clauses} clauses\t{literals} literals\t{variables} variables\n")
 
 valid = res.decomposition.validate(res.decomposition.hypergraph)
 valid_ghtd = GeneralizedHypertreeDecomposition.validate(res.decomposition, res.decomposition.hypergraph)
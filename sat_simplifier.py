@@ -0,0 +1,190 @@
+from collections import defaultdict
+
+"""Simplification of the generated CNF before it is passed to the SAT solver"""
+
+
+class CnfSimplifier:
+    """Removes redundancy from a CNF. Variables in frozen keep their occurrences, as clauses added later on (e.g. the
+    width constraint) may refer to them. Variables in protected are additionally exempt from variable elimination.
+    Use extend to turn a model of the simplified formula into a model of the original formula."""
+
+    def __init__(self, clauses, frozen=None, protected=None, bve_limit=16):
+        self.frozen = set(frozen) if frozen else set()
+        self.protected = self.frozen | (set(protected) if protected else set())
+        self.bve_limit = bve_limit
+
+        self.clauses = []
+        self.index = {}
+        self.occurs = defaultdict(set)
+        self.fixed = {}
+        # Eliminated variables together with their clauses, required for model reconstruction
+        self.stack = []
+        self.conflict = False
+        self.nv = 0
+        self.stats = []
+
+        literals = 0
+        for cl in clauses:
+            self.nv = max(self.nv, max((abs(x) for x in cl), default=0))
+            literals += len(cl)
+            self._add(cl)
+        self.stats.append(("input", len(clauses), literals, self.nv))
+
+    def _add(self, clause):
+        """Adds the clause, unless it is a tautology or a duplicate"""
+        clause = tuple(sorted(set(clause)))
+        if any(-x in clause for x in clause if x > 0):
+            return None
+        if len(clause) == 0:
+            self.conflict = True
+            return None
+        if clause in self.index:
+            return None
+
+        idx = len(self.clauses)
+        self.clauses.append(clause)
+        self.index[clause] = idx
+        for x in clause:
+            self.occurs[x].add(idx)
+
+        return idx
+
+    def _remove(self, idx):
+        clause = self.clauses[idx]
+        self.clauses[idx] = None
+        self.index.pop(clause)
+        for x in clause:
+            self.occurs[x].discard(idx)
+
+    def _alive(self):
+        return (cl for cl in self.clauses if cl is not None)
+
+    def _record(self, stage):
+        clauses = 0
+        literals = 0
+        variables = set()
+        for cl in self._alive():
+            clauses += 1
+            literals += len(cl)
+            variables.update(abs(x) for x in cl)
+        self.stats.append((stage, clauses, literals, len(variables)))
+
+    def propagate(self):
+        """Unit propagation"""
+        queue = [cl[0] for cl in self._alive() if len(cl) == 1]
+
+        while queue and not self.conflict:
+            lit = queue.pop()
+            var = abs(lit)
+            if var in self.fixed:
+                if self.fixed[var] != (lit > 0):
+                    self.conflict = True
+                continue
+
+            self.fixed[var] = lit > 0
+            for idx in list(self.occurs[lit]):
+                self._remove(idx)
+            for idx in list(self.occurs[-lit]):
+                clause = self.clauses[idx]
+                self._remove(idx)
+                idx = self._add([x for x in clause if x != -lit])
+                if idx is not None and len(self.clauses[idx]) == 1:
+                    queue.append(self.clauses[idx][0])
+
+    def subsume(self):
+        """Removes all clauses that are a superset of another clause"""
+        for clause in sorted(self._alive(), key=len):
+            idx = self.index.get(clause)
+            if idx is None:
+                continue
+
+            # Candidates contain every literal of the clause
+            candidates = set.intersection(*sorted((self.occurs[x] for x in clause), key=len))
+            for other in candidates:
+                if other != idx:
+                    self._remove(other)
+
+    def pure_literals(self):
+        """Satisfies all literals that occur in only one polarity"""
+        queue = {abs(x) for x in self.occurs.keys()}
+
+        while queue:
+            var = queue.pop()
+            if var in self.frozen or var in self.fixed:
+                continue
+
+            pos, neg = self.occurs[var], self.occurs[-var]
+            if bool(pos) == bool(neg):
+                continue
+
+            lit = var if pos else -var
+            self.fixed[var] = lit > 0
+            for idx in list(self.occurs[lit]):
+                queue.update(abs(x) for x in self.clauses[idx])
+                self._remove(idx)
+
+    def eliminate(self):
+        """Bounded variable elimination, eliminates variables whose resolvents do not increase the number of
+        clauses."""
+        candidates = [x for x in self.occurs.keys() if x > 0 and x not in self.protected and x not in self.fixed]
+        candidates.sort(key=lambda x: len(self.occurs[x]) * len(self.occurs[-x]))
+
+        for var in candidates:
+            pos = [self.clauses[idx] for idx in self.occurs[var]]
+            neg = [self.clauses[idx] for idx in self.occurs[-var]]
+            if not pos or not neg or len(pos) > self.bve_limit or len(neg) > self.bve_limit:
+                continue
+
+            resolvents = []
+            for c1 in pos:
+                for c2 in neg:
+                    resolvent = {x for x in c1 if x != var}
+                    resolvent.update(x for x in c2 if x != -var)
+                    if not any(-x in resolvent for x in resolvent if x > 0):
+                        resolvents.append(resolvent)
+                if len(resolvents) > len(pos) + len(neg):
+                    break
+
+            if len(resolvents) > len(pos) + len(neg):
+                continue
+
+            self.stack.append((var, pos + neg))
+            for clause in pos + neg:
+                self._remove(self.index[clause])
+            for resolvent in resolvents:
+                self._add(resolvent)
+            if self.conflict:
+                return
+
+    def simplify(self):
+        """Runs all stages and returns the simplified clauses"""
+        self._record("duplicates")
+        for stage, func in (("units", self.propagate), ("subsumption", self.subsume),
+                            ("pure", self.pure_literals), ("bve", self.eliminate)):
+            if self.conflict:
+                break
+            func()
+            self._record(stage)
+
+        if self.conflict:
+            return [[1], [-1]]
+
+        clauses = [list(cl) for cl in self._alive()]
+        # Later clauses may contain frozen variables, their values must be known to the solver
+        clauses.extend([x if self.fixed[x] else -x] for x in self.frozen if x in self.fixed)
+
+        return clauses
+
+    def extend(self, model):
+        """Converts a model of the simplified formula into a model of the original formula"""
+        values = {abs(x): x > 0 for x in model}
+        values.update(self.fixed)
+
+        for var, clauses in reversed(self.stack):
+            values[var] = False
+            for clause in clauses:
+                if var in clause and not any(values.get(abs(x), False) == (x > 0) for x in clause if x != var):
+                    values[var] = True
+                    break
+
+        return [x if values.get(x, False) else -x for x in range(1, max(self.nv, max(values, default=0)) + 1)]
@@ -4,18 +4,27 @@ import re
 from itertools import combinations
 from lib.htd_validate.htd_validate.decompositions import HypertreeDecomposition
 from decomposition_result import DecompositionResult
+from tree_repair import build_tree
 from bounds import upper_bounds
-import networkx as nx
 from collections import defaultdict
+from functools import reduce
 import lib.optimathsat as optimathsat
 import z3
 
 
 class HtdSmtEncoding:
-    def __init__(self, hypergraph, use_z3=False):
+    def __init__(self, hypergraph, use_z3=False, use_terms=False, stream=None, pb_weights=False):
         self.hypergraph = hypergraph
-        self.use_z3 = use_z3
-        if use_z3:
+        # Use Boolean weights with pseudo-Boolean constraints instead of integer weights
+        self.pb_weights = pb_weights
+        # Write the encoding as a SMT-LIB2 script to stream, instead of passing it to a solver
+        self.stream = stream
+        self.use_z3 = use_z3 and stream is None
+        # Build optimathsat formulas using the term API instead of parsing SMT-LIB strings
+        self.use_terms = use_terms and not self.use_z3 and stream is None
+        if stream is not None:
+            self.stream.write("(set-option :produce-models true)\n")
+        elif use_z3:
             self.z3_solver = z3.Optimize()
         else:
             cfg = optimathsat.msat_create_config()
@@ -30,22 +39,49 @@ class HtdSmtEncoding:
         self.weight = defaultdict(dict)
         self.allowed = defaultdict(dict)
         self.ovars = []
+        # Term handles of the optimathsat variables, and the variables read by decode indexed by term id
+        self.terms = {}
+        self.decoded = {}
+        # Cached negations and numerals for the term API
+        self.negs = {}
+        self.numbers = {}
+        # Model read back from the output of a script solver
+        self.script_model = {}
+        # The largest width whose cardinality constraints are encoded, None if they hold for every width
+        self.card_ub = None
         # self.log = open("smt_encoding.log", "w")
 
     def _neg(self, var):
         if self.use_z3:
             return z3.Not(var)
+        elif self.use_terms:
+            key = optimathsat.msat_term_id(var)
+            if key not in self.negs:
+                neg = optimathsat.msat_make_not(self.env, var)
+                self.negs[key] = neg
+                self.negs[optimathsat.msat_term_id(neg)] = var
+            return self.negs[key]
         else:
             if var.startswith("(not "):
                 return var[4:-1]
             else:
                 return f"(not {var})"
 
-    def _add_var(self, name, is_bool=True):
-        if not self.use_z3:
-            optimathsat.msat_declare_function(self.env, name, self.bool_tp if is_bool else self.int_tp)
-            self.ovars.append(name)
+    def _add_var(self, name, is_bool=True, decoded=False):
+        if self.stream is not None:
+            self.stream.write(f"(declare-fun {name} () {'Bool' if is_bool else 'Int'})\n")
+            if decoded:
+                self.decoded[name] = (name, is_bool)
             return name
+        elif not self.use_z3:
+            decl = optimathsat.msat_declare_function(self.env, name, self.bool_tp if is_bool else self.int_tp)
+            term = optimathsat.msat_make_constant(self.env, decl)
+            self.terms[name] = term
+            var = term if self.use_terms else name
+            self.ovars.append(var)
+            if decoded:
+                self.decoded[optimathsat.msat_term_id(term)] = (var, is_bool)
+            return var
         else:
             if not is_bool:
                 return z3.Int(name)
@@ -53,7 +89,12 @@ class HtdSmtEncoding:
                 return z3.Bool(name)
 
     def _add_formula(self, formula):
-        if not self.use_z3:
+        if self.stream is not None:
+            self.stream.write(f"(assert {formula})\n")
+        elif self.use_terms:
+            assert (not optimathsat.MSAT_ERROR_TERM(formula))
+            optimathsat.msat_assert_formula(self.env, formula)
+        elif not self.use_z3:
             clause = optimathsat.msat_from_string(self.env, formula)
             assert (not optimathsat.MSAT_ERROR_TERM(clause))
             optimathsat.msat_assert_formula(self.env, clause)
@@ -112,7 +153,7 @@ class HtdSmtEncoding:
         # ordering
         for i in range(1, n + 1):
             for j in range(i + 1, n + 1):
-                self.ord[i][j] = self._add_var(f"ord_{i}_{j}")
+                self.ord[i][j] = self._add_var(f"ord_{i}_{j}", decoded=True)
                 self.ord[j][i] = self._neg(self.ord[i][j])
 
         # arcs
@@ -120,12 +161,14 @@ class HtdSmtEncoding:
             for j in range(1, n + 1):
                 if i != j:
                     # declare arc_ij variables
-                    self.arc[i][j] = self._add_var(f"arc_{i}_{j}")
+                    self.arc[i][j] = self._add_var(f"arc_{i}_{j}", decoded=True)
 
         # weights
         for j in range(1, n + 1):
             for ej in range(1, m + 1):
-                self.weight[j][ej] = self._add_var(f"weight_{j}_e{ej}", is_bool=False)
+                self.weight[j][ej] = self._add_var(f"weight_{j}_e{ej}", is_bool=self.pb_weights, decoded=True)
+                if self.pb_weights:
+                    continue
                 # Worse, keep encoding below
                 # self.stream.write("(assert (or (= weight_{i}_e{ej} 0) (= weight_{i}_e{ej} 1)))\n".format(i=j, ej=ej))
                 self._add_formula(self._create_seq(self.weight[j][ej], 1))
@@ -134,34 +177,87 @@ class HtdSmtEncoding:
     def _add_clause(self, *C):
         if self.use_z3:
             self.z3_solver.add(z3.Or(C))
+        elif self.use_terms:
+            self._add_formula(reduce(lambda x, y: optimathsat.msat_make_or(self.env, x, y), C))
         else:
             self._add_formula("(or %s)" % (' '.join(C)))
 
+    def _number(self, val):
+        """Returns the term for an integer constant, other terms are returned unchanged"""
+        if not isinstance(val, int):
+            return val
+        if val not in self.numbers:
+            self.numbers[val] = optimathsat.msat_make_number(self.env, str(val))
+        return self.numbers[val]
+
     def _create_sum(self, parts):
         if self.use_z3:
             return z3.Sum(parts)
+        elif self.use_terms:
+            return reduce(lambda x, y: optimathsat.msat_make_plus(self.env, x, y), parts)
         else:
             return f"(+ {' '.join(parts)})" if len(parts) > 1 else parts[0]
 
     def _create_seq(self, smaller, bigger):
         if self.use_z3:
             return bigger >= smaller
+        elif self.use_terms:
+            return optimathsat.msat_make_leq(self.env, self._number(smaller), self._number(bigger))
         else:
             return f"(>= {bigger} {smaller})"
 
+    def _create_eq(self, var, val):
+        if self.use_z3:
+            return var == val
+        elif self.use_terms:
+            return optimathsat.msat_make_equal(self.env, var, self._number(val))
+        else:
+            return f"(= {var} {val})"
+
+    def _create_count(self, lst):
+        """Returns the number of true Boolean variables in lst as an integer term"""
+        if self.use_z3:
+            return z3.Sum([z3.If(x, 1, 0) for x in lst])
+        elif self.use_terms:
+            return self._create_sum([optimathsat.msat_make_term_ite(self.env, x, self._number(1), self._number(0))
+                                     for x in lst])
+        else:
+            return self._create_sum([f"(ite {x} 1 0)" for x in lst])
+
+    def _weight_eq(self, var, val):
+        """Returns the condition that the weight var has the value val, which is either 0 or 1"""
+        if self.pb_weights:
+            return var if val else self._neg(var)
+        return self._create_eq(var, val)
+
     def _create_atmost(self, lst, bound):
         if not self.use_z3:
             raise RuntimeError("Atmost is only supported by Z3")
         # Does not work with variables, bound needs to be a constant
         return z3.AtMost(*lst, bound)
 
-    def encode_cardinality(self):
+    def encode_cardinality(self, ub=None):
+        """Bounds the weights of every bag by m. With pseudo-Boolean weights on Z3, the constraints are only encoded for
+        widths up to ub, this limit is recorded in card_ub."""
         n = self.hypergraph.number_of_nodes()
         m = self.hypergraph.number_of_edges()
+        # A bag has at most m edges, hence the constraints for widths of m and above always hold
+        if self.pb_weights and self.use_z3 and ub is not None and ub < m - 1:
+            self.card_ub = ub
+        else:
+            self.card_ub = None
+
         for j in range(1, n + 1):
             weights = [self.weight[j][ej] for ej in range(1, m+1)]
-            weights = self._create_sum(weights)
-            self._add_formula(self._create_seq(weights, self.m))
+            if not self.pb_weights:
+                weights = self._create_sum(weights)
+                self._add_formula(self._create_seq(weights, self.m))
+            elif self.use_z3:
+                # The bound of a pseudo-Boolean constraint must be a constant, link each possible width to m
+                for k in range(1, (self.card_ub if self.card_ub is not None else m - 1) + 1):
+                    self._add_formula(z3.Implies(self.m <= k, self._create_atmost(weights, k)))
+            else:
+                self._add_formula(self._create_seq(self._create_count(weights), self.m))
 
     def elimination_ordering(self, n):
         # Some improvements
@@ -202,8 +298,11 @@ class HtdSmtEncoding:
             for e in self.hypergraph.incident_edges(i):
                 weights.append(self.weight[i][e])
 
-            summed = self._create_sum(weights)
-            self._add_formula(self._create_seq(1, summed))
+            if self.pb_weights:
+                self._add_clause(*weights)
+            else:
+                summed = self._create_sum(weights)
+                self._add_formula(self._create_seq(1, summed))
 
             for j in range(1, n + 1):
                 if i == j:
@@ -214,9 +313,12 @@ class HtdSmtEncoding:
                 for e in self.hypergraph.incident_edges(j):
                     weights.append(self.weight[i][e])
 
-                summed = self._create_sum(weights)
-                compared = self._create_seq(1, summed)
-                self._add_clause(self._neg(self.arc[i][j]), compared)
+                if self.pb_weights:
+                    self._add_clause(self._neg(self.arc[i][j]), *weights)
+                else:
+                    summed = self._create_sum(weights)
+                    compared = self._create_seq(1, summed)
+                    self._add_clause(self._neg(self.arc[i][j]), compared)
 
     def break_clique(self, clique, htd):
         if clique:
@@ -270,32 +372,97 @@ class HtdSmtEncoding:
                     self.z3_solver.add(self.m >= lb)
             self.z3_solver.minimize(self.m)
         else:
-            m_obj = optimathsat.msat_make_minimize(self.env, optimathsat.msat_from_string(self.env, "m"))
-            optimathsat.msat_assert_objective(self.env, m_obj)
             if fix_val:
-                self._add_formula(f"(= m {fix_val})")
+                self._add_formula(self._create_eq(self.m, fix_val))
             else:
                 if ub:
-                    self._add_formula(f"(<= m {ub})")
+                    self._add_formula(self._create_seq(self.m, ub))
                 if lb:
-                    self._add_formula(f"(>= m {lb})")
+                    self._add_formula(self._create_seq(lb, self.m))
 
         self.encode(clique=clique, htd=htd)
         if sb:
             self._symmetry_breaking(self.hypergraph.number_of_nodes())
 
-        self.encode_cardinality()
+        self.encode_cardinality(ub=fix_val if fix_val else ub)
 
-        if self.use_z3:
+        if self.stream is not None:
+            self.stream.write("(minimize m)\n(check-sat)\n(get-objectives)\n")
+            self.stream.write(f"(get-value ({' '.join(self.decoded)}))\n")
+            self.stream.flush()
+            return None
+        elif self.use_z3:
             self.z3_solver.check()
         else:
-            m_obj = optimathsat.msat_make_minimize(self.env, optimathsat.msat_from_string(self.env, "m"))
+            m_obj = optimathsat.msat_make_minimize(self.env, self._m_term())
             optimathsat.msat_assert_objective(self.env, m_obj)
             res = optimathsat.msat_solve(self.env)
             assert (res == optimathsat.MSAT_SAT)
 
         return self.decode(htd)
 
+    def encode_incremental(self, clique=None, htd=True, sb=False, ub=None):
+        """Encodes the instance once, bounds on the width are then checked with solve_bound. Without ub, the encoding
+        supports every bound, otherwise solve_bound is limited to bounds up to ub."""
+        if self.stream is not None:
+            raise RuntimeError("Incremental solving is not supported for scripts")
+
+        self.prepare_vars()
+        self.encode(clique=clique, htd=htd)
+        if sb:
+            self._symmetry_breaking(self.hypergraph.number_of_nodes())
+        self.encode_cardinality(ub=ub)
+
+    def solve_bound(self, htd=True, lb=None, ub=None, fix_val=None):
+        """Finds a minimal decomposition within the bounds, or returns None if there is none. The bounds are
+        retracted afterwards, while the encoding and the learned lemmas are kept for the next call."""
+        bound = fix_val if fix_val else ub
+        if self.card_ub is not None and (not bound or bound > self.card_ub):
+            raise ValueError(f"The width constraints are only encoded up to {self.card_ub}")
+
+        if self.use_z3:
+            self.z3_solver.push()
+            if fix_val:
+                self.z3_solver.add(self.m == fix_val)
+            else:
+                if ub:
+                    self.z3_solver.add(self.m <= ub)
+                if lb:
+                    self.z3_solver.add(self.m >= lb)
+            self.z3_solver.minimize(self.m)
+            res = self.decode(htd) if self.z3_solver.check() == z3.sat else None
+            self.z3_solver.pop()
+        else:
+            optimathsat.msat_push_backtrack_point(self.env)
+            if fix_val:
+                self._add_formula(self._create_eq(self.m, fix_val))
+            else:
+                if ub:
+                    self._add_formula(self._create_seq(self.m, ub))
+                if lb:
+                    self._add_formula(self._create_seq(lb, self.m))
+            optimathsat.msat_assert_objective(self.env, optimathsat.msat_make_minimize(self.env, self._m_term()))
+            res = self.decode(htd) if optimathsat.msat_solve(self.env) == optimathsat.MSAT_SAT else None
+            optimathsat.msat_pop_backtrack_point(self.env)
+
+        return res
+
+    def read_result(self, output, htd=True):
+        """Decodes the output of a solver run on the script written by solve"""
+        if output.split(maxsplit=1)[:1] != ["sat"]:
+            return None
+
+        model = {}
+        # Covers the values of the objectives as well as the model
+        for name, val in re.findall(r"\(\s*([^\s()]+)\s+(true|false|\d+)\s*\)", output):
+            model[name] = val == "true" if val in ("true", "false") else int(val)
+        self.script_model = model
+
+        return self.decode(htd)
+
+    def _m_term(self):
+        return self.terms["m"]
+
     def _symmetry_breaking(self, n):
         ls = {x: self._add_var(f"ls{x}") for x in range(1, n+1)}
         s = {x: {} for x in range(1, n+1)}
@@ -326,17 +493,12 @@ class HtdSmtEncoding:
             self._add_clause(*clause)
 
     def decode(self, htd):
-        model = {}
-        if self.use_z3:
+        if self.stream is not None:
+            model = self.script_model
+        elif self.use_z3:
             model = self.z3_solver.model()
         else:
-            for vn in self.ovars:
-                cval = optimathsat.msat_get_model_value(self.env, optimathsat.msat_from_string(self.env, vn))
-                try:
-                    model[vn] = int(f"{cval}")
-                except ValueError:
-                    model[vn] = f"{cval}".find("true") > 0
-
+            model = self._get_model()
         try:
             ordering = self._get_ordering(model)
             weights = self._get_weights(model, ordering)
@@ -346,39 +508,7 @@ class HtdSmtEncoding:
                                                         weights=weights)
 
             if htd:
-                for i in range(1, self.hypergraph.number_of_nodes()+1):
-                    for j in range(1, self.hypergraph.number_of_nodes() + 1):
-                        if i != j and arcs[i][j]:
-                            htdd.bags[i].add(j)
-
-                htdd.tree = nx.DiGraph()
-                for i in range(0, len(ordering)):
-                    n = ordering[i]
-                    for j in range(i+1, len(ordering)):
-                        v = ordering[j]
-                        if arcs[n][v]:
-                            htdd.tree.add_edge(v, n)
-                            break
-
-                # TODO: This is really inefficient
-                root = [n for n in htdd.tree.nodes if len(list(htdd.tree.predecessors(n))) == 0][0]
-                q = [root]
-                while q:
-                    n = q.pop()
-                    q.extend(list(htdd.tree.successors(n)))
-                    desc = set(nx.descendants(htdd.tree, n))
-
-                    # Omitted intersected with descendants
-                    problem = (htdd._B(n) - htdd.bags[n]) & desc
-                    while problem:
-                        d = problem.pop()
-                        pth = nx.shortest_path(htdd.tree, source=n, target=d)
-                        pth.pop()
-                        while pth:
-                            c_node = pth.pop()
-
-                            # We know that every bag on the bath from n to d is a subset of d
-                            htdd.bags[c_node].update(htdd.bags[d])
+                build_tree(htdd, ordering, arcs)
 
             return DecompositionResult(htdd.width(), htdd, arcs, ordering, weights)
         except RuntimeError:
@@ -386,6 +516,28 @@ class HtdSmtEncoding:
 
         return None
 
+    def _get_model(self):
+        """Reads the decoded variables from the optimathsat model in a single pass. Unset weights are omitted."""
+        model = {var: False for var, is_bool in self.decoded.values() if is_bool}
+
+        it = optimathsat.msat_create_model_iterator(self.env)
+        while optimathsat.msat_model_iterator_has_next(it):
+            term, val = optimathsat.msat_model_iterator_next(it)
+            entry = self.decoded.get(optimathsat.msat_term_id(term))
+            if entry is None:
+                continue
+
+            var, is_bool = entry
+            if is_bool:
+                model[var] = bool(optimathsat.msat_term_is_true(self.env, val))
+            else:
+                val = int(optimathsat.msat_term_repr(val))
+                if val != 0:
+                    model[var] = val
+        optimathsat.msat_destroy_model_iterator(it)
+
+        return model
+
     def _get_ordering(self, model):
         ordering = list(range(1, self.hypergraph.number_of_nodes() + 1))
 
@@ -407,10 +559,15 @@ class HtdSmtEncoding:
             ret[i] = {}
             for e in self.hypergraph.edges():
                 assert (e > 0)
-                if self.use_z3:
-                    ret[i][e] = model[self.weight[i][e]].as_long()
+                if self.use_z3 and self.pb_weights:
+                    val = int(z3.is_true(model.eval(self.weight[i][e], model_completion=True)))
+                elif self.use_z3:
+                    val = model[self.weight[i][e]].as_long()
                 else:
-                    ret[i][e] = model[self.weight[i][e]]
+                    val = int(model.get(self.weight[i][e], 0))
+                # Sparse, only the chosen edges are stored
+                if val != 0:
+                    ret[i][e] = val
 
         last_vertex = ordering[-1]
         incident_edges = self.hypergraph.incident_edges(last_vertex).keys()
@@ -424,11 +581,11 @@ class HtdSmtEncoding:
         ret = {}
 
         for i in range(1, n+1):
+            # Sparse, only the true arcs are stored
             ret[i] = {}
-            ret[i][i] = False
             for j in range(1, n+1):
-                if i != j:
-                    ret[i][j] = model[self.arc[i][j]]
+                if i != j and (z3.is_true(model[self.arc[i][j]]) if self.use_z3 else model[self.arc[i][j]]):
+                    ret[i][j] = True
 
         return ret
 
@@ -452,8 +609,15 @@ class HtdSmtEncoding:
                     # = 1 is superior to > 0. = 0 and = 1 (i.e. express it as or vs. =>) does have an impact on performance
                     # none is superior, it depends on the instance...
                     # TODO: This is a hack, but it is faster than using a clause...
-                    if self.use_z3:
+                    if self.pb_weights:
+                        self._add_clause(self._neg(self.arc[i][j]), self._neg(self.allowed[i][j]),
+                                         self._neg(self.weight[i][e]), self.weight[j][e])
+                    elif self.use_z3:
                         self._add_formula(z3.Implies(z3.And(self.arc[i][j], self.allowed[i][j], self.weight[i][e] == 1), self.weight[j][e] == 1))
+                    elif self.use_terms:
+                        self._add_clause(self._neg(self.arc[i][j]), self._neg(self.allowed[i][j]),
+                                         self._neg(self._create_eq(self.weight[i][e], 1)),
+                                         self._create_eq(self.weight[j][e], 1))
                     else:
                         self._add_formula(f"(=> (and {self.arc[i][j]} {self.allowed[i][j]} (= {self.weight[i][e]} 1)) (= {self.weight[j][e]} 1))")
 
@@ -467,7 +631,4 @@ class HtdSmtEncoding:
                     self._add_clause(self._neg(self.arc[i][j]), self._neg(self.arc[j][k]), self.arc[i][k], self._neg(self.allowed[i][k]))
 
                 for e in self.hypergraph.incident_edges(i):
-                    if self.use_z3:
-                        self._add_clause(self.allowed[i][j], self.weight[j][e] == 0)
-                    else:
-                        self._add_clause(self.allowed[i][j], f"(= {self.weight[j][e]} 0)")
+                    self._add_clause(self.allowed[i][j], self._weight_eq(self.weight[j][e], 0))
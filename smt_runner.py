@@ -24,6 +24,17 @@ parser.add_argument('-g', dest='ghtd', action='store_true', default=False,
 parser.add_argument('-v', dest='verbose', action='store_false', default=True, help='Suppress output of decomposition')
 parser.add_argument('-b', dest="sb", default=False, action='store_true', help="Activate symmetry breaking")
 parser.add_argument('-z', dest="z3", default=False, action='store_true', help="Use Z3 solver instead of optimathsat")
+parser.add_argument('-a', dest="terms", default=False, action='store_true',
+                    help="Build the optimathsat formulas with the term API instead of SMT-LIB strings")
+parser.add_argument('-w', dest="pb", default=False, action='store_true',
+                    help="Use Boolean weights with pseudo-Boolean constraints instead of integer weights")
+parser.add_argument('-r', dest="portfolio", default=None, type=str,
+                    help="Run a portfolio of the given comma separated backends (optimathsat, z3, sat)")
+parser.add_argument('-x', dest="script_solver", default=None, type=str,
+                    help="Pipe the encoding as a SMT-LIB2 script to this solver (optimathsat, z3 or a command line)")
+parser.add_argument('-o', dest="script", default=None, type=str,
+                    help="SMT-LIB2 script file, an existing script is reused")
+parser.add_argument('-m', dest="memory", default=None, type=int, help="Memory limit of the script solver in MB")
 parser.add_argument('-q', dest="clique", default=0, type=int, action='store', help="Clique mode, 0 is disabled")
 
 args = parser.parse_args()
@@ -34,11 +45,28 @@ before_tm = time.time()
 fl = 'solve_runner'
 
 # Compute solution for GHTD
-if args.ghtd:
-    res = solver.solve(args.graph, htd=False, clique_mode=args.clique, sb=args.sb)
+if args.portfolio:
+    res = solver.solve_portfolio(args.graph, backends=args.portfolio.split(","), htd=not args.ghtd,
+                                 clique_mode=args.clique, sb=args.sb, use_terms=args.terms, pb_weights=args.pb)
+    td = res.decomposition if res is not None else None
+    if res is not None:
+        print(f"Portfolio winner: {res.backend}\t" +
+              "\t".join(f"{k}: {'failed' if k in res.failed else v}" for k, v in res.runtimes.items()))
+elif args.script_solver or args.script:
+    res = solver.solve_script(args.graph, solver=args.script_solver, script=args.script, htd=not args.ghtd,
+                              clique_mode=args.clique, sb=args.sb, memory_limit=args.memory,
+                              pb_weights=args.pb)
+    if args.script_solver is None:
+        print(f"Script written to {args.script}")
+        exit(0)
+    td = res.decomposition if res is not None else None
+elif args.ghtd:
+    res = solver.solve(args.graph, htd=False, clique_mode=args.clique, sb=args.sb, use_z3=args.z3,
+                       use_terms=args.terms, pb_weights=args.pb)
     td = res.decomposition if res is not None else None
 else:
-    res = solver.solve(args.graph, htd=True, clique_mode=args.clique, sb=args.sb)
+    res = solver.solve(args.graph, htd=True, clique_mode=args.clique, sb=args.sb, use_z3=args.z3,
+                       use_terms=args.terms, pb_weights=args.pb)
     td = res.decomposition if res is not None else None
 
 # Display result if available
@@ -63,20 +91,4 @@ if (args.ghtd and not valid_ghtd) or not valid:
     exit(1)
 
 if args.verbose:
-    mode = "ghtd" if args.ghtd else "htd"
-    print(f"s {mode} {len(td.bags)} {res.size} {len(td.hypergraph.nodes())} {len(td.hypergraph.edges())}")
-
-    # Output bags
-    for k, v in td.bags.items():
-        print("b {} {}".format(k, " ".join((str(x) for x in v))))
-    print("")
-
-    # Output edges
-    for u, v in td.tree.edges:
-        print(f"{u} {v}")
-    print("")
-
-    # Output edge function
-    for k, v in td.hyperedge_function.items():
-        for k2, v2 in v.items():
-            print(f"w {k} {k2} {v2}")
+    res.write("ghtd" if args.ghtd else "htd")
@@ -1,16 +1,31 @@
-from itertools import combinations
+import io
+import multiprocessing
+import os
+import queue
+import resource
+import shlex
+import subprocess
+import time
 
-from networkx import Graph
-from networkx.algorithms.approximation import max_clique
-from networkx.algorithms.clique import find_cliques
+from pysat.solvers import Glucose4
 
 import smt_encoding
+from bounds import upper_bounds, lower_bounds
+from bounds.clique import max_clique
+from sat_encoding import HtdSatEncoding
 from lib.htd_validate.htd_validate.utils.hypergraph import Hypergraph
 
 """Starts the correct solver and returns the solver result"""
 
 
-def solve(input_file, clique_mode=0, htd=True, lb=None, fix_val=None, sb=False, use_z3=False):
+# Commands for solvers that read a SMT-LIB2 script from stdin, other solvers are given as a command line
+script_solvers = {
+    "optimathsat": ["optimathsat", "-input=smt2"],
+    "z3": ["z3", "-in", "-smt2"]
+}
+
+
+def _load(input_file, clique_mode):
     # Load graph. There is no working auto detect of encoding, so try both options
     hypergraph_in = Hypergraph.from_file(input_file, fischl_format=False)
     hypergraph2 = Hypergraph.from_file(input_file, fischl_format=True)
@@ -20,19 +35,19 @@ def solve(input_file, clique_mode=0, htd=True, lb=None, fix_val=None, sb=False,
 
     hypergraph = hypergraph_in
 
-    # Find clique if requested
+    # Find clique if requested, mode 1 returns the best clique found within a second
     clique = None
     if clique_mode > 0:
-        pv = Graph()
-        for e in hypergraph.edges():
-            # PRIMAL GRAPH CONSTRUCTION
-            for u, v in combinations(hypergraph.get_edge(e), 2):
-                pv.add_edge(u, v)
-
-        if clique == 1:
-            clique = max_clique(pv)
-        else:
-            _, clique = max((len(x), x) for x in find_cliques(pv))
+        clique = max_clique(hypergraph, timeout=1 if clique_mode == 1 else None)
+
+    return hypergraph, clique
+
+
+def solve(input_file, clique_mode=0, htd=True, lb=None, fix_val=None, sb=False, use_z3=False, use_terms=False,
+          pb_weights=False):
+    hypergraph, clique = _load(input_file, clique_mode)
+    if lb is None and fix_val is None:
+        lb = lower_bounds.lower_bound(hypergraph, clique)
 
     # Create encoding
     ub = None
@@ -42,7 +57,140 @@ def solve(input_file, clique_mode=0, htd=True, lb=None, fix_val=None, sb=False,
     # if fix_val is None and ub is None:
     #     ub = ubs.greedy(hypergraph, htd) if not weighted else wub.greedy(hypergraph)
     #     print(ub)
-    enc = smt_encoding.HtdSmtEncoding(hypergraph, use_z3=use_z3)
+    enc = smt_encoding.HtdSmtEncoding(hypergraph, use_z3=use_z3, use_terms=use_terms, pb_weights=pb_weights)
     res = enc.solve(htd=htd, fix_val=fix_val, clique=clique, lb=lb, ub=ub, sb=sb)
 
-    return res
\ No newline at end of file
+    return res
+
+
+def _limit_memory(memory_limit):
+    """Returns a function that limits the address space of the solver process to memory_limit MB"""
+    if memory_limit is None:
+        return None
+
+    def limit():
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit * 1024 * 1024, memory_limit * 1024 * 1024))
+    return limit
+
+
+def solve_script(input_file, solver=None, script=None, clique_mode=0, htd=True, lb=None, fix_val=None, sb=False,
+                 timeout=None, memory_limit=None, pb_weights=False):
+    """Writes the encoding as a SMT-LIB2 script and runs it on a solver process. The script is stored in the file
+    script, an existing script is reused. Without a solver, only the script is written and None is returned."""
+    hypergraph, clique = _load(input_file, clique_mode)
+    if lb is None and fix_val is None and not (script is not None and os.path.exists(script)):
+        lb = lower_bounds.lower_bound(hypergraph, clique)
+    cmd = None if solver is None else script_solvers.get(solver, shlex.split(solver))
+    preexec = _limit_memory(memory_limit)
+
+    if script is not None:
+        if os.path.exists(script):
+            # The variable names are required for decoding
+            enc = smt_encoding.HtdSmtEncoding(hypergraph, stream=io.StringIO(), pb_weights=pb_weights)
+            enc.prepare_vars()
+        else:
+            with open(script, "w") as f:
+                enc = smt_encoding.HtdSmtEncoding(hypergraph, stream=f, pb_weights=pb_weights)
+                enc.solve(htd=htd, fix_val=fix_val, clique=clique, lb=lb, sb=sb)
+
+        if cmd is None:
+            return None
+
+        with open(script) as f:
+            proc = subprocess.Popen(cmd, stdin=f, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                    universal_newlines=True, preexec_fn=preexec)
+    else:
+        if cmd is None:
+            raise ValueError("Either a solver or a script file is required")
+        proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                universal_newlines=True, preexec_fn=preexec)
+        # The script is streamed to the solver while it is created
+        enc = smt_encoding.HtdSmtEncoding(hypergraph, stream=proc.stdin, pb_weights=pb_weights)
+        try:
+            enc.solve(htd=htd, fix_val=fix_val, clique=clique, lb=lb, sb=sb)
+        except BrokenPipeError:
+            # The solver exited early, e.g. because it ran out of memory
+            pass
+
+    try:
+        output, _ = proc.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.communicate()
+        return None
+
+    return enc.read_result(output, htd)
+
+
+def _run_backend(backend, input_file, clique_mode, htd, sb, use_terms, pb_weights, results):
+    """Portfolio worker, reports the result of the backend and its runtime"""
+    tm_start = time.time()
+    try:
+        if backend == "sat":
+            hypergraph, clique = _load(input_file, clique_mode)
+            ub = upper_bounds.greedy(hypergraph, False, bb=False)
+            res = HtdSatEncoding(hypergraph).solve(ub, htd, lambda: Glucose4(incr=True), sb=sb, incremental=True,
+                                                   clique=clique, lb=lower_bounds.lower_bound(hypergraph, clique))
+        else:
+            res = solve(input_file, clique_mode=clique_mode, htd=htd, sb=sb, use_z3=backend == "z3",
+                        use_terms=use_terms, pb_weights=pb_weights)
+    except Exception:
+        # A failing backend, e.g. due to a missing solver library, must not stop the portfolio
+        res = None
+    results.put((backend, res, time.time() - tm_start))
+
+
+def solve_portfolio(input_file, backends=("optimathsat", "z3", "sat"), clique_mode=0, htd=True, sb=False,
+                    timeout=None, use_terms=False, pb_weights=False):
+    """Runs the backends in separate processes, the first optimal result stops all others. The result records the
+    winning backend, the runtimes of the backends, which are None for stopped and failed backends, and the backends
+    that failed without a result. The SMT options use_terms and pb_weights apply to the SMT backends only."""
+    results = multiprocessing.Queue()
+    workers = {}
+    for backend in backends:
+        if backend not in ("optimathsat", "z3", "sat"):
+            raise ValueError(f"Unknown backend {backend}")
+        workers[backend] = multiprocessing.Process(target=_run_backend,
+                                                   args=(backend, input_file, clique_mode, htd, sb, use_terms,
+                                                         pb_weights, results))
+        workers[backend].start()
+
+    tm_start = time.time()
+    runtimes = {backend: None for backend in backends}
+    # Backends that crashed or returned no result, these have no runtime
+    failed = []
+    pending = set(backends)
+    res = None
+    while res is None and pending:
+        remaining = None if timeout is None else timeout - (time.time() - tm_start)
+        if remaining is not None and remaining <= 0:
+            break
+
+        try:
+            backend, c_res, runtime = results.get(timeout=1 if remaining is None else min(1, remaining))
+        except queue.Empty:
+            # Workers that died without reporting, e.g. killed due to memory, count as failed
+            for backend, worker in workers.items():
+                if backend in pending and not worker.is_alive() and results.empty():
+                    pending.discard(backend)
+                    failed.append(backend)
+            continue
+
+        pending.discard(backend)
+        if c_res is not None:
+            runtimes[backend] = runtime
+            res = c_res
+            res.backend = backend
+        else:
+            failed.append(backend)
+
+    for worker in workers.values():
+        if worker.is_alive():
+            worker.terminate()
+        worker.join()
+
+    if res is not None:
+        res.runtimes = runtimes
+        res.failed = failed
+
+    return res
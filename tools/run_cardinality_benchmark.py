@@ -0,0 +1,46 @@
+import argparse
+import time
+import logging
+
+from pysat.solvers import Glucose4
+
+import bounds.upper_bounds as bnd
+import sat_cardinality
+from lib.htd_validate.htd_validate.utils.hypergraph import Hypergraph
+from sat_encoding import HtdSatEncoding
+
+"""Compares the width constraint backends of the SAT encoding. Outputs one line per instance and backend:
+instance;backend;width;variables;clauses;width clauses;time"""
+
+logging.disable(logging.FATAL)
+
+parser = argparse.ArgumentParser(description='Benchmark the width constraint backends of the SAT encoding')
+parser.add_argument('graphs', metavar='graph_file', type=str, nargs='+', help='The instances to run')
+parser.add_argument('-g', dest='ghtd', action='store_true', default=False, help='Compute a GHTD instead of a HTD')
+parser.add_argument('-w', dest='backends', type=str, default=",".join(sat_cardinality.backends.keys()),
+                    help='Comma separated list of backends to compare')
+args = parser.parse_args()
+
+for instance in args.graphs:
+    for backend in args.backends.split(","):
+        hypergraph_in = Hypergraph.from_file(instance, fischl_format=False)
+        hypergraph2 = Hypergraph.from_file(instance, fischl_format=True)
+
+        if hypergraph_in is None or (hypergraph2 is not None and len(hypergraph2.edges()) > len(hypergraph_in.edges())):
+            hypergraph_in = hypergraph2
+
+        current_bound = bnd.greedy(hypergraph_in, not args.ghtd, bb=False)
+
+        tm_start = time.time()
+        encoder = HtdSatEncoding(hypergraph_in)
+        try:
+            res = encoder.solve(current_bound, not args.ghtd, lambda: Glucose4(incr=True), incremental=True,
+                                width_backend=backend)
+        except RuntimeError as e:
+            print(f"{instance};{backend};{e}")
+            continue
+
+        width = encoder.width_constraint
+        nof_vars = max(encoder.pool.top, width.top_id)
+        nof_clauses = len(encoder.formula.clauses) + width.nof_clauses
+        print(f"{instance};{backend};{res.size};{nof_vars};{nof_clauses};{width.nof_clauses};{time.time() - tm_start}")
@@ -0,0 +1,69 @@
+import argparse
+import time
+from itertools import combinations
+from sys import maxsize
+
+from networkx import Graph
+
+import bounds.upper_bounds as bnd
+from bounds.set_cover import CoverIndex
+from lib.htd_validate.htd_validate.utils.hypergraph import Hypergraph
+
+"""Compares the indexed lazy greedy cover to scanning all edges in every step, as cover_ghtd and greedy_cover did
+before. Outputs one line per instance and cover: instance;cover;width;time"""
+
+
+def scan_cover(g, bags, w=None):
+    edge_cover = {n: {e: 0 for e in g.edges().keys()} for n in g.nodes()}
+
+    for k, v in bags.items():
+        remaining = set(v)
+
+        while len(remaining) > 0:
+            c_best = (maxsize, None, None)
+            for e, ed in g.edges().items():
+                ed = set(ed)
+
+                intersect = len(remaining & ed)
+                if intersect > 0:
+                    ratio = (w[e] if w else 1) * 1.0 / intersect
+                    if ratio < c_best[0]:
+                        c_best = (ratio, e, ed)
+
+            _, e, ed = c_best
+            remaining -= ed
+            edge_cover[k][e] = w[e] if w else 1
+
+    return edge_cover
+
+
+def indexed_cover(g, bags, w=None):
+    index = CoverIndex(g, weights=w)
+    return {k: index.cover(v) for k, v in bags.items()}
+
+
+parser = argparse.ArgumentParser(description='Benchmark the greedy edge cover of bags')
+parser.add_argument('graphs', metavar='graph_file', type=str, nargs='+', help='The instances to run')
+parser.add_argument('-w', dest='weighted', action='store_true', default=False, help='Use the edge weights')
+parser.add_argument('-r', dest='rounds', type=int, default=10, help='Number of repetitions per cover')
+args = parser.parse_args()
+
+for instance in args.graphs:
+    hypergraph_in = Hypergraph.from_file(instance, fischl_format=False, weighted=args.weighted)
+    hypergraph2 = Hypergraph.from_file(instance, fischl_format=True, weighted=args.weighted)
+
+    if hypergraph_in is None or (hypergraph2 is not None and len(hypergraph2.edges()) > len(hypergraph_in.edges())):
+        hypergraph_in = hypergraph2
+
+    pg = Graph()
+    for e in hypergraph_in.edges():
+        for u, v in combinations(hypergraph_in.get_edge(e), 2):
+            pg.add_edge(u, v)
+    bags, _, _ = bnd.ordering_to_decomp(pg, bnd.compute_ordering(pg))
+    weights = hypergraph_in.weights() if args.weighted else None
+
+    for name, func in (("scan", scan_cover), ("indexed", indexed_cover)):
+        tm_start = time.time()
+        for _ in range(args.rounds):
+            cover = func(hypergraph_in, bags, weights)
+        print(f"{instance};{name};{max(sum(v.values()) for v in cover.values())};{(time.time() - tm_start) / args.rounds}")
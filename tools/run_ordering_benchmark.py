@@ -0,0 +1,40 @@
+import argparse
+import time
+from itertools import combinations
+
+from networkx import Graph
+
+import bounds.upper_bounds as bnd
+from lib.htd_validate.htd_validate.utils.hypergraph import Hypergraph
+
+"""Compares the elimination ordering heuristics. Outputs one line per instance and criterion, sorted by instance size:
+instance;vertices;primal edges;criterion;treewidth bound;time"""
+
+parser = argparse.ArgumentParser(description='Benchmark the elimination ordering heuristics')
+parser.add_argument('graphs', metavar='graph_file', type=str, nargs='+', help='The instances to run')
+parser.add_argument('-c', dest='criteria', type=str, default="degree,fill",
+                    help='Comma separated list of criteria to compare (degree, fill)')
+args = parser.parse_args()
+
+instances = []
+for instance in args.graphs:
+    hypergraph_in = Hypergraph.from_file(instance, fischl_format=False)
+    hypergraph2 = Hypergraph.from_file(instance, fischl_format=True)
+
+    if hypergraph_in is None or (hypergraph2 is not None and len(hypergraph2.edges()) > len(hypergraph_in.edges())):
+        hypergraph_in = hypergraph2
+
+    pg = Graph()
+    for e in hypergraph_in.edges():
+        for u, v in combinations(hypergraph_in.get_edge(e), 2):
+            pg.add_edge(u, v)
+    instances.append((pg.number_of_nodes(), pg.number_of_edges(), instance, pg))
+
+for n, m, instance, pg in sorted(instances, key=lambda x: x[:2]):
+    for criterion in args.criteria.split(","):
+        tm_start = time.time()
+        ordering = bnd.compute_ordering(pg, criterion=criterion)
+        tm_ordering = time.time() - tm_start
+
+        bags, _, _ = bnd.ordering_to_decomp(pg, ordering)
+        print(f"{instance};{n};{m};{criterion};{max(len(b) for b in bags.values()) - 1};{tm_ordering}")
@@ -0,0 +1,45 @@
+import argparse
+import time
+import logging
+
+import lib.optimathsat as optimathsat
+from lib.htd_validate.htd_validate.utils.hypergraph import Hypergraph
+from smt_encoding import HtdSmtEncoding
+
+"""Compares building the optimathsat encoding from SMT-LIB strings to using the term API. Outputs one line per
+instance and mode: instance;mode;encoding time;solving time;width"""
+
+logging.disable(logging.FATAL)
+
+parser = argparse.ArgumentParser(description='Benchmark the formula construction of the SMT encoding')
+parser.add_argument('graphs', metavar='graph_file', type=str, nargs='+', help='The instances to run')
+parser.add_argument('-g', dest='ghtd', action='store_true', default=False, help='Compute a GHTD instead of a HTD')
+parser.add_argument('-s', dest='solve', action='store_true', default=False, help='Also solve the encoding')
+args = parser.parse_args()
+
+for instance in args.graphs:
+    for mode, use_terms in (("string", False), ("terms", True)):
+        hypergraph_in = Hypergraph.from_file(instance, fischl_format=False)
+        hypergraph2 = Hypergraph.from_file(instance, fischl_format=True)
+
+        if hypergraph_in is None or (hypergraph2 is not None and len(hypergraph2.edges()) > len(hypergraph_in.edges())):
+            hypergraph_in = hypergraph2
+
+        tm_start = time.time()
+        enc = HtdSmtEncoding(hypergraph_in, use_terms=use_terms)
+        enc.prepare_vars()
+        enc.encode(htd=not args.ghtd)
+        enc.encode_cardinality()
+        tm_encoding = time.time() - tm_start
+
+        width = None
+        tm_solving = 0
+        if args.solve:
+            tm_start = time.time()
+            optimathsat.msat_assert_objective(enc.env, optimathsat.msat_make_minimize(enc.env, enc._m_term()))
+            optimathsat.msat_solve(enc.env)
+            res = enc.decode(not args.ghtd)
+            width = res.size if res is not None else None
+            tm_solving = time.time() - tm_start
+
+        print(f"{instance};{mode};{tm_encoding};{tm_solving};{width}")
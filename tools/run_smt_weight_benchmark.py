@@ -0,0 +1,34 @@
+import argparse
+import time
+import logging
+
+from lib.htd_validate.htd_validate.utils.hypergraph import Hypergraph
+from smt_encoding import HtdSmtEncoding
+
+"""Compares integer weights to Boolean weights with pseudo-Boolean constraints in the SMT encoding. Outputs one line
+per instance, solver and weight encoding: instance;solver;weights;width;time"""
+
+logging.disable(logging.FATAL)
+
+parser = argparse.ArgumentParser(description='Benchmark the weight encodings of the SMT encoding')
+parser.add_argument('graphs', metavar='graph_file', type=str, nargs='+', help='The instances to run')
+parser.add_argument('-g', dest='ghtd', action='store_true', default=False, help='Compute a GHTD instead of a HTD')
+parser.add_argument('-s', dest='solvers', type=str, default="optimathsat,z3",
+                    help='Comma separated list of solvers to compare, optimathsat and/or z3')
+args = parser.parse_args()
+
+for instance in args.graphs:
+    for solver in args.solvers.split(","):
+        for mode, pb_weights in (("int", False), ("pb", True)):
+            hypergraph_in = Hypergraph.from_file(instance, fischl_format=False)
+            hypergraph2 = Hypergraph.from_file(instance, fischl_format=True)
+
+            if hypergraph_in is None or (hypergraph2 is not None and len(hypergraph2.edges()) > len(hypergraph_in.edges())):
+                hypergraph_in = hypergraph2
+
+            tm_start = time.time()
+            enc = HtdSmtEncoding(hypergraph_in, use_z3=solver == "z3", use_terms=solver != "z3", pb_weights=pb_weights)
+            res = enc.solve(htd=not args.ghtd)
+            width = res.size if res is not None else None
+
+            print(f"{instance};{solver};{mode};{width};{time.time() - tm_start}")
@@ -0,0 +1,74 @@
+import networkx as nx
+
+"""Construction of the decomposition tree from the arcs of a model, shared by the SAT and SMT decoding"""
+
+
+def _to_set(bits):
+    ret = set()
+    while bits:
+        low = bits & -bits
+        ret.add(low.bit_length() - 1)
+        bits ^= low
+    return ret
+
+
+def build_tree(htdd, ordering, arcs):
+    """Adds the arc successors to the bags and connects every vertex to its first arc successor in the ordering.
+    Afterwards, every vertex below a node that is covered by the node's edges is added to the bags on the path."""
+    pos = {v: i for i, v in enumerate(ordering)}
+
+    # Bags and hyperedges as bitsets, bit v represents vertex v
+    bags = {}
+    parent = {}
+    for n in ordering:
+        bag = 0
+        for v in htdd.bags[n]:
+            bag |= 1 << v
+
+        c_parent = None
+        for v, is_arc in arcs[n].items():
+            if is_arc and v != n:
+                bag |= 1 << v
+                if pos[v] > pos[n] and (c_parent is None or pos[v] < pos[c_parent]):
+                    c_parent = v
+        bags[n] = bag
+        parent[n] = c_parent
+
+    edges = {}
+    for e, vertices in htdd.hypergraph.edges().items():
+        edges[e] = 0
+        for v in vertices:
+            edges[e] |= 1 << v
+
+    # Children precede their parent in the ordering, this collects the vertices below each node bottom-up
+    below = {n: 0 for n in ordering}
+    for n in ordering:
+        if parent[n] is not None:
+            below[parent[n]] |= below[n] | (1 << n)
+
+    # Parents precede their children in the reversed ordering, i.e. the bags of a node are fixed top-down
+    for n in reversed(ordering):
+        covered = 0
+        for e, val in htdd.hyperedge_function[n].items():
+            if val > 0:
+                covered |= edges[e]
+
+        # Omitted intersected with descendants
+        problem = covered & ~bags[n] & below[n]
+        while problem:
+            low = problem & -problem
+            problem ^= low
+            d = low.bit_length() - 1
+
+            # Every bag on the path from d to n is a subset of d's bag
+            c_node = parent[d]
+            while True:
+                bags[c_node] |= bags[d]
+                if c_node == n:
+                    break
+                c_node = parent[c_node]
+
+    htdd.tree = nx.DiGraph()
+    htdd.tree.add_edges_from((parent[n], n) for n in ordering if parent[n] is not None)
+    for n in ordering:
+        htdd.bags[n] = _to_set(bags[n])
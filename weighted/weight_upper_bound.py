@@ -1,7 +1,7 @@
 from networkx import Graph
 from itertools import combinations
 import bounds.upper_bounds as ub
-from sys import maxsize
+from bounds.set_cover import cover_index
 
 
 def greedy(g, bb=True):
@@ -24,27 +24,5 @@ def greedy(g, bb=True):
 
 def greedy_cover(g, bags):
     """Computes a cover by greedily packing the cheapest edge (per covered vertex)"""
-    edge_cover = {n: {e: 0 for e in g.edges().keys()} for n in g.nodes()}
-    w = g.weights()
-
-    for k, v in bags.items():
-        remaining = set(v)
-
-        # cover bag, minimize cost per covered vertex
-        while len(remaining) > 0:
-            c_best = (maxsize, None, None)
-            for e, ed in g.edges().items():
-                ed = set(ed)
-
-                intersect = len(remaining & ed)
-                if intersect > 0:
-                    ratio = w[e] * 1.0 / intersect
-                    if ratio < c_best[0]:
-                        c_best = (ratio, e, ed)
-
-            _, e, ed = c_best
-            remaining -= ed
-            edge_cover[k][e] = w[e]
-
-    return edge_cover
-
+    index = cover_index(g, g.weights())
+    return {k: index.cover(v) for k, v in bags.items()}